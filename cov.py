@@ -1,20 +1,213 @@
+import copy
+import errno
 import os
+import queue
 import re
+import shlex
 import shutil
 import subprocess
+import tarfile
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
-from typing import Dict, List, Optional, Tuple, cast
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, cast
 
-# Optional dependency for parsing llvm-cov HTML output
+# Optional docker SDK: container lifecycle over the daemon socket instead of `docker` CLI processes
 try:
-    from bs4 import BeautifulSoup, Tag  # type: ignore
-except Exception:  # pragma: no cover - if bs4 missing, fallback parser will be used
-    BeautifulSoup = None  # type: ignore
-    Tag = None  # type: ignore
+    import docker as docker_sdk  # type: ignore
+except Exception:  # pragma: no cover - the docker CLI is used instead
+    docker_sdk = None  # type: ignore
+
+# Optional dependency for vectorized bucketing of very large groups
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - pure-Python bucketing is used instead
+    np = None  # type: ignore
+
+# Groups at least this large are bucketed with numpy (when available); below this the
+# array setup costs more than the per-file Python arithmetic it replaces
+_NP_BUCKET_MIN = 4096
+
+# Interval bucket directory names ("<start>-<end>"), tested with fullmatch
+_BUCKET_RE = re.compile(r"(\d+)-(\d+)")
+
+
+class BucketKey(NamedTuple):
+    """Numeric identity of an interval bucket; orders by (start, end), unlike its label string."""
+
+    start: int
+    end: int
+
+    @property
+    def label(self) -> str:
+        return f"{self.start}-{self.end}"
+
+# Markers and exit codes of the fused per-bucket script (see _finish_bucket_in_container)
+_STEP_RM = "__UDCC_RM_RC__="
+_STEP_REPORT = "__UDCC_REPORT__"
+_RC_MERGE, _RC_MV, _RC_CP, _RC_REPORT = 90, 91, 92, 93
+
+
+class _CoverageStepError(RuntimeError):
+    """HTML report generation failed for a bucket; the run continues with the next bucket."""
+
+
+# Markers framing each command's output on the persistent docker shell (see DLLCovCollector._sh)
+_SH_OUT_MARK = "__UDCC_STDOUT_END__"
+_SH_END_MARK = "__UDCC_EXIT__"
+_SH_STDERR = "/tmp/.udcc_sh_stderr"
+
+# Directories the scan never descends into: bytecode caches and VCS/virtualenv trees
+_SKIP_DIRS = frozenset({"__pycache__", ".git", ".venv"})
+
+
+def _scan_py(path: str, rel_dir: str = "") -> Iterator[Tuple[str, str, str, float]]:
+    """Yield (path, name, rel_dir, mtime) for every .py file under path.
+
+    rel_dir is the file's parent directory relative to the top-level path ("" for files
+    directly under it), built up during the walk so callers never need os.path.relpath.
+    Uses os.scandir so the mtime comes from the DirEntry's cached stat rather than a
+    separate os.path.getmtime() call per file. The walk keeps an explicit stack instead of
+    recursing, so each item is yielded directly rather than through one `yield from` frame
+    per directory level. Symlinks are not followed, and _SKIP_DIRS are pruned. Like os.walk,
+    directories that cannot be listed (e.g. PermissionError) are skipped silently.
+    """
+    stack = [(path, rel_dir)]
+    while stack:
+        dir_path, dir_rel = stack.pop()
+        try:
+            it = os.scandir(dir_path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in _SKIP_DIRS:
+                        continue
+                    stack.append((entry.path, dir_rel + os.sep + entry.name if dir_rel else entry.name))
+                elif entry.is_file(follow_symlinks=False):
+                    # A name ending in ".py" can never also end in ".pyc", so one suffix test suffices
+                    if not entry.name.endswith(".py"):
+                        continue
+                    try:
+                        ts = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, entry.name, dir_rel, ts
+
+
+def _scan_py_parallel(path: str) -> Iterator[Tuple[str, str, str, float]]:
+    """Like _scan_py(path), but each top-level subdirectory is walked on its own thread.
+
+    Directory reads and stats release the GIL, so the per-group walks overlap. Items are
+    yielded in exactly the order _scan_py would produce them.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = [e for e in it if not e.is_symlink()]
+    except OSError:
+        return
+    subdirs = [e for e in entries if e.is_dir(follow_symlinks=False) and e.name not in _SKIP_DIRS]
+    if len(subdirs) < 2:
+        yield from _scan_py(path)
+        return
+    with ThreadPoolExecutor(max_workers=min(len(subdirs), (os.cpu_count() or 1) * 2)) as ex:
+        walks = [ex.submit(lambda p, n: list(_scan_py(p, n)), e.path, e.name) for e in subdirs]
+        # Same order as _scan_py's stack: top-level files first, then subdirectories last-in first-out
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.name.endswith(".py"):
+                try:
+                    ts = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                yield entry.path, entry.name, "", ts
+        for walk in reversed(walks):
+            yield from walk.result()
+
+
+def _substring_filter(required: List[str]) -> Optional["re.Pattern[str]"]:
+    """Compile 'path contains ALL of required' into one regex (None when there is nothing to test).
+
+    Each substring gets its own lookahead, so, like all(sub in path ...), order doesn't matter.
+    """
+    if not required:
+        return None
+    return re.compile("".join(f"(?=.*?{re.escape(sub)})" for sub in required), re.DOTALL)
+
+
+# Character after each backslash escape in a regex, and the letter escapes that can never match '/'
+_ESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+_SEP_FREE_ESCAPES = frozenset("dwsbBAZ")
+
+
+def _name_only_reject_safe(pattern: str) -> bool:
+    """Return True if a pattern that misses a file's basename must also miss its relative path.
+
+    That holds when every match has to end at the end of the string and cannot span a path
+    separator: the pattern is end-anchored, has no alternation or lookbehind, and contains
+    nothing that could match '/' (a literal separator, '.', character classes, \\W/\\S/\\D, or
+    a numeric/named escape such as \\x2f, \\057, \\u002f or \\N{SOLIDUS}). A pattern like
+    'non_crash' has no '/' but can still match a directory name, so it is not eligible.
+    When in doubt this returns False, which only disables the shortcut.
+    """
+    if "/" in pattern or os.sep in pattern or "|" in pattern or "(?<" in pattern:
+        return False
+    # Escaped punctuation is a literal; of the letter escapes only these cannot match '/'
+    # (\x, \u, \U, \N, octal/backreference digits and \W/\S/\D all can, or might)
+    if any(c.isalnum() and c not in _SEP_FREE_ESCAPES for c in _ESCAPE_RE.findall(pattern)):
+        return False
+    unescaped = re.sub(r"\\.", "", pattern)
+    if "." in unescaped or "[" in unescaped:
+        return False
+    return unescaped.endswith("$") or pattern.endswith("\\Z")
+
+
+def _copy_file(src: str, dst: str) -> None:
+    """Copy src to dst with an in-kernel os.copy_file_range where available.
+
+    Falls back to shutil.copyfile if copy_file_range is missing or unsupported for
+    this pair of filesystems. Permission bits are not preserved.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            src_fd = os.open(src, os.O_RDONLY)
+            try:
+                dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+                        pass
+                finally:
+                    os.close(dst_fd)
+            finally:
+                os.close(src_fd)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink src to dst, falling back to _copy_file across devices, where links are refused, or at the link limit."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        # Stale entry from an earlier classification run: replace it
+        os.unlink(dst)
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            _copy_file(src, dst)
+        else:
+            raise
+
 
 class DLLCovCollector:
-    def __init__(self, ver: str, target: str, output: str, dll: str, itv: int, baseline: str, num_parallel: int, filter: Optional[str] = None, max_time_sec: Optional[int] = 600):
+    def __init__(self, ver: str, target: str, output: str, dll: str, itv: int, baseline: str, num_parallel: int, filter: Optional[str] = None, max_time_sec: Optional[int] = 600, pipeline: bool = False, num_containers: int = 1, bind_mount: bool = False):
         self.ver = ver
         self.target = target
         self.output = output
@@ -35,8 +228,34 @@ class DLLCovCollector:
             self.docker_image = f"ncsu-swat/torch-{self.ver}-instrumented"
             self.docker_name = f"torch_cov_{self.ver}-{baseline}" if baseline else f"torch_cov_{self.ver}"
         self.docker_id = ""
+        # Persistent `docker exec -i bash` used by exec_in_docker (see _sh)
+        self._shell: Optional["subprocess.Popen[str]"] = None
+        self._shell_lock = threading.Lock()
+        # docker SDK client/container when the SDK is installed and the daemon is reachable
+        self._client: Any = None
+        self._container: Any = None
+        if docker_sdk is not None:
+            try:
+                self._client = docker_sdk.from_env()
+            except Exception:
+                self._client = None
+        # Container lookups that can't change for a given image (see _find_tool/_find_libtorch)
+        self._tool_cache: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], Optional[str]] = {}
+        self._libtorch: Optional[str] = None
         self.result_dir = f"{output}/{baseline}"
+        # Bind-mount bucket inputs (read-only) and profdata output instead of copying them;
+        # _data_mounts is filled in by collect() once the bucket tree is known
+        self.bind_mount = bind_mount
+        self._data_mounts: List[Tuple[str, str, str]] = []
+        # llvm-cov HTML output: bind-mounted host directory and its path inside the container
+        self.html_host_root = os.path.join(os.path.abspath(output), "cov-html")
+        self.html_container_root = "/root/cov-html"
         self.num_parallel = num_parallel
+        # Overlap bucket copy-in/copy-out with driver execution on worker threads
+        self.pipeline = pipeline
+        # Containers used to run bucket drivers concurrently (1 = primary container only)
+        self.num_containers = max(1, num_containers)
+        self._workers: List["DLLCovCollector"] = []
         # Max time horizon for bucketing (seconds). If None or <=0, no cutoff.
         try:
             self.max_time_sec = int(max_time_sec) if max_time_sec is not None else None
@@ -53,6 +272,14 @@ class DLLCovCollector:
             print("Received Ctrl+C, exiting...")
 
     def check_image(self):
+        if self._client is not None:
+            try:
+                self._client.images.get(self.docker_image)
+                return True
+            except docker_sdk.errors.ImageNotFound:
+                raise RuntimeError(f"Docker image '{self.docker_image}' not found. Please build it via build.sh")
+            except docker_sdk.errors.APIError as e:
+                raise RuntimeError(f"Failed to find Docker image: {e}, please run build.sh.")
         # use docker image to check
         cmd = ["docker", "images", "-q", self.docker_image]
         result = subprocess.run(cmd, capture_output=True, text=True)
@@ -64,28 +291,124 @@ class DLLCovCollector:
         return ok
 
     def start_docker(self):
-        cmd = ["docker", "run", "-td", "--name", self.docker_name, self.docker_image]
+        # HTML reports are written straight to the host through a bind mount
+        os.makedirs(self.html_host_root, exist_ok=True)
+        if self._client is not None:
+            print(f"Creating Docker container {self.docker_name} ")
+            try:
+                self._container = self._client.containers.run(
+                    self.docker_image, detach=True, tty=True, name=self.docker_name,
+                    volumes={host: {"bind": path, "mode": mode} for host, path, mode in self._mounts()},
+                )
+            except docker_sdk.errors.APIError as e:
+                raise RuntimeError(f"Failed to create Docker container: {e}")
+            self.docker_id = self._container.id
+            self._open_shell()
+            return
+        cmd = ["docker", "run", "-td", "--name", self.docker_name]
+        for host, path, mode in self._mounts():
+            cmd += ["-v", f"{host}:{path}:{mode}"]
+        cmd.append(self.docker_image)
         print(f"Creating Docker container {self.docker_name} ")
         result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             raise RuntimeError(f"Failed to create Docker container: {result.stderr.strip()}")
         self.docker_id = result.stdout.strip()
+        self._open_shell()
+
+    def _mounts(self) -> List[Tuple[str, str, str]]:
+        """(host dir, container dir, mode) bind mounts for new containers."""
+        return [(self.html_host_root, self.html_container_root, "rw"), *self._data_mounts]
+
+    def _open_shell(self) -> None:
+        """Open a long-lived `docker exec -i <c> bash` that exec_in_docker sends commands to."""
+        self._shell = subprocess.Popen(
+            ["docker", "exec", "-i", self.docker_id or self.docker_name, "bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace",
+        )
+
+    def _close_shell(self) -> None:
+        shell, self._shell = self._shell, None
+        if shell is None:
+            return
+        try:
+            if shell.stdin:
+                shell.stdin.close()
+            shell.wait(timeout=5)
+        except Exception:
+            shell.kill()
+        finally:
+            if shell.stdout:
+                shell.stdout.close()
+
+    def _sh(self, cmd: str, workdir: Optional[str] = None) -> Tuple[int, str, str]:
+        """Run a shell command line through the persistent shell.
+
+        The command runs in a subshell (so `cd` doesn't leak) with stdin from /dev/null and
+        stderr captured to a file, then the shell prints stdout, a marker, the captured stderr
+        and an end marker carrying the exit code. Returns (returncode, stdout, stderr).
+        """
+        shell = self._shell
+        if shell is None or shell.stdin is None or shell.stdout is None:
+            raise RuntimeError("Persistent shell is not running")
+        if workdir:
+            cmd = f"cd {shlex.quote(workdir)} && {cmd}"
+        script = (
+            f"( {cmd} ) </dev/null 2>{_SH_STDERR}; __rc=$?; "
+            f"printf '\\0{_SH_OUT_MARK}\\n'; cat {_SH_STDERR}; printf '\\0{_SH_END_MARK}%d\\n' $__rc\n"
+        )
+        shell.stdin.write(script)
+        shell.stdin.flush()
+
+        out: List[str] = []
+        err: List[str] = []
+        out_mark = f"\0{_SH_OUT_MARK}\n"
+        end_mark = f"\0{_SH_END_MARK}"
+        sink = out
+        while True:
+            line = shell.stdout.readline()
+            if not line:
+                raise RuntimeError("Persistent shell exited unexpectedly")
+            if sink is out and line.endswith(out_mark):
+                out.append(line[: -len(out_mark)])
+                sink = err
+                continue
+            if sink is err:
+                idx = line.find(end_mark)
+                if idx != -1:
+                    err.append(line[:idx])
+                    return int(line[idx + len(end_mark):].strip()), "".join(out), "".join(err)
+            sink.append(line)
 
-    def stop_docker(self):
-        cmd = ["docker", "stop", self.docker_id]
-        print(f"Stopping Docker container {self.docker_name}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            raise RuntimeError(f"Failed to stop Docker container: {result.stderr.strip()}")
-        
     def rm_docker(self):
         cmd = ["docker", "rm", "-fv", self.docker_id]
         print(f"Removing Docker container {self.docker_name}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        self._close_shell()
+        if self._container is not None:
+            container, self._container = self._container, None
+            try:
+                container.remove(force=True, v=True)
+            except docker_sdk.errors.APIError as e:
+                raise RuntimeError(f"Failed to remove Docker container: {e}")
+            return
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
         if result.returncode != 0:
             raise RuntimeError(f"Failed to remove Docker container: {result.stderr.strip()}")
 
     def restart_docker(self):
+        if self._client is not None:
+            try:
+                running = self._client.containers.list(filters={"name": self.docker_name})
+            except docker_sdk.errors.APIError as e:
+                raise RuntimeError(f"Failed to check Docker container status: {e}")
+            if running:
+                self._container = running[0]
+                self.docker_id = self._container.id
+                self.rm_docker()
+            print(f"Starting Docker container {self.docker_name}")
+            self.start_docker()
+            return
         # check if the docker is running
         cmd = ["docker", "ps", "-q", "-f", f"name={self.docker_name}"]
         result = subprocess.run(cmd, capture_output=True, text=True)
@@ -93,9 +416,7 @@ class DLLCovCollector:
             raise RuntimeError(f"Failed to check Docker container status: {result.stderr.strip()}")
         container_id = result.stdout.strip()
         if container_id:
-            print(f"Stopping running Docker container {self.docker_name}")
-            self.stop_docker()
-            print(f"Removing Docker container {self.docker_name}")
+            self.docker_id = container_id
             self.rm_docker()
         print(f"Starting Docker container {self.docker_name}")
         self.start_docker()
@@ -114,9 +435,11 @@ class DLLCovCollector:
 
         Notes:
         - On many systems (Linux), true creation/birth time is unavailable; we use modification time
-          (os.path.getmtime) as a proxy.
+          (DirEntry.stat().st_mtime) as a proxy.
         - If multiple files share the same basename within a destination directory, a numeric suffix
           is appended to avoid collisions.
+        - When self.target and self.result_dir are on the same filesystem, files are hardlinked
+          rather than copied.
 
         Optional filtering:
         - regex_pattern: Optional regex string applied to the path relative to self.target.
@@ -137,56 +460,56 @@ class DLLCovCollector:
             print(f"Invalid regex pattern '{regex_pattern}': {e}")
             compiled_regex = None
 
-        def get_creation_time(path: str) -> float:
-            """Return the chosen timestamp for bucketing.
-
-            Per request, we use modification time as the canonical timestamp:
-            os.path.getmtime(path) -> float seconds since epoch.
-            """
-            try:
-                return float(os.path.getmtime(path))
-            except Exception:
-                # Fallback: stat and use st_mtime directly if getmtime fails
-                st = os.stat(path)
-                return float(st.st_mtime)
-
         # 1) Collect Python files and their times, grouping by top-level directory
         # group_name "" corresponds to files directly under target
-        grouped: Dict[str, List[Tuple[str, float]]] = {}
-        for root, _dirs, files in os.walk(self.target):
-            for name in files:
-                if not name.endswith(".py"):
-                    continue
-                if name == "__init__.pyc" or name.endswith(".pyc"):
-                    continue
-                full = os.path.join(root, name)
-                # Apply regex filter if provided (match against path relative to target)
-                rel_to_target = os.path.relpath(full, self.target)
-                if compiled_regex and not compiled_regex.search(rel_to_target):
-                    continue
-                try:
-                    ts = get_creation_time(full)
-                except FileNotFoundError:
-                    continue
-                # Determine top-level group
-                parts = rel_to_target.split(os.sep)
-                group = parts[0] if len(parts) > 1 else ""
-                grouped.setdefault(group, []).append((full, ts))
+        # Each group tracks its files plus running min/max timestamps so no second pass is needed.
+        grouped: Dict[str, Dict[str, Any]] = {}
+        # Patterns that can only match within the last path component are tried on the basename
+        # first, so rejected files never pay for os.path.relpath
+        name_prefilter = compiled_regex is not None and _name_only_reject_safe(compiled_regex.pattern)
+        # rel_dir -> (group, path of rel_dir within that group); one entry per directory
+        dir_split: Dict[str, Tuple[str, str]] = {}
+        for full, name, rel_dir, ts in _scan_py_parallel(self.target):
+            if name_prefilter and not compiled_regex.search(name):  # type: ignore[union-attr]
+                continue
+            # Apply regex filter if provided (match against path relative to target)
+            if compiled_regex and not compiled_regex.search(rel_dir + os.sep + name if rel_dir else name):
+                continue
+            # Determine top-level group
+            split = dir_split.get(rel_dir)
+            if split is None:
+                head, _sep, tail = rel_dir.partition(os.sep)
+                split = dir_split[rel_dir] = (head, tail)
+            group, rel_within_group = split
+            g = grouped.get(group)
+            if g is None:
+                grouped[group] = {"files": [(full, name, rel_within_group, ts)], "min": ts, "max": ts}
+            else:
+                g["files"].append((full, name, rel_within_group, ts))
+                if ts < g["min"]:
+                    g["min"] = ts
+                if ts > g["max"]:
+                    g["max"] = ts
 
         if not grouped:
             print("No Python files found to classify.")
             return cast(Dict[str, int], {})
 
-        counts: Dict[str, int] = {}
+        counts: Counter[str] = Counter()
         total = 0
+        copy_tasks: List[Tuple[str, str]] = []
+        dest_dirs: Set[str] = set()
+        claimed: Dict[str, Set[str]] = defaultdict(set)
         # 2) For each group, bucket relative to that group's min timestamp
-        for group, group_files in grouped.items():
-            if not group_files:
-                continue
-            group_min = min(ts for _p, ts in group_files)
-            group_max = max(ts for _p, ts in group_files)
+        for group, g in grouped.items():
+            group_files: List[Tuple[str, str, str, float]] = g["files"]
+            group_min: float = g["min"]
+            group_max: float = g["max"]
             print(f"Group '{group or 'ROOT'}' min_ts: {group_min}, max_ts: {group_max}")
 
+            # Bucket index -> label; files in the same bucket share one label string
+            label_memo: Dict[int, str] = {}
+
             def bucket_label_g(ts: float) -> str:
                 # Compute offset in seconds from group min
                 offset = max(0, int(ts - group_min))
@@ -197,106 +520,225 @@ class DLLCovCollector:
                     # include exact max boundary in the last bucket
                     if offset == self.max_time_sec:
                         offset = self.max_time_sec - 1
-                start = (offset // self.itv) * self.itv
-                end = start + self.itv
-                if self.max_time_sec is not None and end > self.max_time_sec:
-                    end = self.max_time_sec
-                return f"{start}-{end}"
+                return label_for_idx(offset // self.itv)
+
+            def label_for_idx(idx: int) -> str:
+                label = label_memo.get(idx)
+                if label is None:
+                    start = idx * self.itv
+                    end = start + self.itv
+                    if self.max_time_sec is not None and end > self.max_time_sec:
+                        end = self.max_time_sec
+                    label = label_memo[idx] = f"{start}-{end}"
+                return label
+
+            if np is not None and len(group_files) >= _NP_BUCKET_MIN:
+                # Same arithmetic as bucket_label_g, done over the whole group at once
+                ts_arr = np.fromiter((f[3] for f in group_files), dtype=np.float64, count=len(group_files))
+                offsets = np.maximum(0, (ts_arr - group_min).astype(np.int64))
+                if self.max_time_sec is not None:
+                    skip = (offsets > self.max_time_sec).tolist()
+                    offsets[offsets == self.max_time_sec] = self.max_time_sec - 1
+                    group_labels = [
+                        "__SKIP__" if skipped else label_for_idx(idx)
+                        for idx, skipped in zip((offsets // self.itv).tolist(), skip)
+                    ]
+                else:
+                    group_labels = [label_for_idx(idx) for idx in (offsets // self.itv).tolist()]
+            else:
+                group_labels = [bucket_label_g(f[3]) for f in group_files]
 
-            for full, ts in group_files:
+            # (label, rel_within_group) -> destination dir; shared by every file of that directory
+            dest_cache: Dict[Tuple[str, str], str] = {}
+            for (full, basename, rel_within_group, _ts), label in zip(group_files, group_labels):
                 total += 1
-                label = bucket_label_g(ts)
                 if label == "__SKIP__":
                     # Beyond max_time_sec cutoff
                     continue
-                counts[label] = counts.get(label, 0) + 1
+                counts[label] += 1
 
                 # Build destination dir: result_dir/label/<group>/path-within-group-parent
-                if group:
-                    group_root = os.path.join(self.target, group)
-                    rel_within_group = os.path.relpath(os.path.dirname(full), group_root)
-                    dest_dir = os.path.join(self.result_dir, label, group)
-                    if rel_within_group and rel_within_group != ".":
-                        dest_dir = os.path.join(dest_dir, rel_within_group)
-                else:
-                    # Files directly under target: preserve their subpath relative to target
-                    rel_parent = os.path.relpath(os.path.dirname(full), self.target)
-                    dest_dir = os.path.join(self.result_dir, label)
-                    if rel_parent and rel_parent != ".":
-                        dest_dir = os.path.join(dest_dir, rel_parent)
-
-                os.makedirs(dest_dir, exist_ok=True)
-
-                dest_path = os.path.join(dest_dir, os.path.basename(full))
-                if os.path.exists(dest_path):
-                    base, ext = os.path.splitext(os.path.basename(full))
+                # (files directly under target keep their subpath relative to target)
+                dest_dir = dest_cache.get((label, rel_within_group))
+                if dest_dir is None:
+                    if rel_within_group:
+                        dest_dir = os.path.join(self.result_dir, label, group, rel_within_group)
+                    elif group:
+                        dest_dir = os.path.join(self.result_dir, label, group)
+                    else:
+                        dest_dir = os.path.join(self.result_dir, label)
+                    dest_cache[(label, rel_within_group)] = dest_dir
+                    dest_dirs.add(dest_dir)
+
+                # Resolve name collisions against the names already claimed in dest_dir
+                used = claimed[dest_dir]
+                if basename in used:
+                    base, ext = os.path.splitext(basename)
                     i = 1
-                    while os.path.exists(dest_path):
-                        dest_path = os.path.join(dest_dir, f"{base}__{i}{ext}")
+                    while f"{base}__{i}{ext}" in used:
                         i += 1
-
-                shutil.copy(full, dest_path)
+                    basename = f"{base}__{i}{ext}"
+                used.add(basename)
+                copy_tasks.append((full, os.path.join(dest_dir, basename)))
+
+        # 3) Create each destination directory once, then copy in parallel; copies are
+        #    syscall-bound and release the GIL, so threads overlap disk/FS latency.
+        for d in dest_dirs:
+            os.makedirs(d, exist_ok=True)
+        if copy_tasks:
+            # Same filesystem: hardlink instead of copying (metadata-only, no file data I/O)
+            same_fs = os.stat(self.target).st_dev == os.stat(self.result_dir).st_dev
+            place = _link_or_copy if same_fs else _copy_file
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=max_workers) as ex:
+                list(ex.map(lambda t: place(*t), copy_tasks))
 
         bucket_count = len(counts)
         print(
             f"Classified and copied {total} Python files into {bucket_count} buckets under '{self.result_dir}'."
         )
-        return counts
+        return dict(counts)
 
     def copy_to_docker(self, from_path: str, to_path: str):
+        """Copy a host file or directory into the container, with `docker cp` semantics.
 
+        A directory lands inside to_path (to_path/<name>); a file is written to to_path, or
+        into it when to_path ends with '/'. Goes through the same single tar stream as
+        bulk_copy_to_docker, which also creates the destination directory.
+        """
         src = os.path.abspath(from_path)
         if not os.path.exists(src):
             raise FileNotFoundError(f"Source path does not exist: {src}")
 
-        container_ref = self.docker_id or self.docker_name
-        if not container_ref:
-            raise RuntimeError("Docker container is not initialized. Call start_docker() first.")
-
+        if os.path.isdir(src):
+            self._tar_into_docker(to_path, [(src, os.path.basename(src))])
+        elif to_path.endswith("/"):
+            self._tar_into_docker(to_path, [(src, os.path.basename(src))])
+        else:
+            self._tar_into_docker(os.path.dirname(to_path) or "/", [(src, os.path.basename(to_path))])
+        print(f"Copied to container: {src} -> {self.docker_id or self.docker_name}:{to_path}")
 
-        # Compute destination directory and ensure it exists inside the container
-        is_src_dir = os.path.isdir(src)
-        if is_src_dir:
-            dest_dir = to_path  # copy directory into this directory
+    def copy_from_docker(self, from_path: str, to_path: str):
+        """Copy a container file or directory to the host, with `docker cp` semantics."""
+        to_abs = os.path.abspath(to_path)
+        name = os.path.basename(from_path.rstrip("/"))
+        if os.path.isdir(to_abs):
+            host_dir, host_name = to_abs, name
         else:
-            # If to_path ends with '/', treat it as a directory; else treat it as a full file path
-            dest_dir = to_path if to_path.endswith("/") else (os.path.dirname(to_path) or "/")
+            host_dir, host_name = os.path.dirname(to_abs) or to_abs, os.path.basename(to_abs)
+        self.bulk_copy_from_docker(os.path.dirname(from_path.rstrip("/")) or "/", host_dir, [name], rename={name: host_name})
+        if not os.path.lexists(os.path.join(host_dir, host_name)):
+            raise RuntimeError(f"Failed to copy '{from_path}' from container: no such file or directory")
 
-        mk = subprocess.run(
-            ["docker", "exec", container_ref, "mkdir", "-p", dest_dir],
-            capture_output=True, text=True
-        )
-        if mk.returncode != 0:
-            raise RuntimeError(f"Failed to create destination directory '{dest_dir}' in container: {mk.stderr.strip()}")
+    def bulk_copy_to_docker(self, host_root: str, container_dest: str, members: Optional[List[str]] = None):
+        """Stream host_root (or only the given members of it) into container_dest as one tar.
 
-        # Determine final docker cp destination
-        if is_src_dir:
-            dest = f"{container_ref}:{dest_dir}"
+        A single `docker exec -i ... tar -x` ingests everything, instead of paying one
+        `docker cp` (plus a mkdir exec) per directory.
+        """
+        src = os.path.abspath(host_root)
+        if not os.path.isdir(src):
+            raise FileNotFoundError(f"Source directory does not exist: {src}")
+        if members is None:
+            items = [(src, ".")]
         else:
-            dest = f"{container_ref}:{to_path if not to_path.endswith('/') else dest_dir}"
+            items = [(os.path.join(src, m), m) for m in members]
+        self._tar_into_docker(container_dest, items)
+        print(f"Copied to container: {src} -> {self.docker_id or self.docker_name}:{container_dest}")
 
-        cp = subprocess.run(["docker", "cp", src, dest], capture_output=True, text=True)
-        if cp.returncode != 0:
-            raise RuntimeError(f"Failed to copy '{src}' to '{dest}': {cp.stderr.strip()}")
-        print(f"Copied to container: {src} -> {dest}")
+    def _tar_into_docker(self, container_dest: str, items: List[Tuple[str, str]]) -> None:
+        """Write (host_path, arcname) items as a tar stream extracted under container_dest."""
+        container_ref = self.docker_id or self.docker_name
+        if not container_ref:
+            raise RuntimeError("Docker container is not initialized. Call start_docker() first.")
 
-    def copy_from_docker(self, from_path: str, to_path: str):
+        cmd = [
+            "docker", "exec", "-i", container_ref,
+            "sh", "-c", 'mkdir -p "$1" && tar -xf - -C "$1"', "sh", container_dest,
+        ]
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=err)
+            assert proc.stdin is not None
+            try:
+                with tarfile.open(fileobj=proc.stdin, mode="w|") as tar:
+                    for path, arcname in items:
+                        tar.add(path, arcname=arcname)
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+            rc = proc.wait()
+            if rc != 0:
+                err.seek(0)
+                raise RuntimeError(f"Failed to stream {[p for p, _ in items]} to '{container_ref}:{container_dest}': {err.read().decode(errors='ignore').strip()}")
+
+    def bulk_copy_from_docker(self, container_src: str, host_dest: str, members: Optional[List[str]] = None, rename: Optional[Dict[str, str]] = None):
+        """Stream container_src (or only the given members of it) out of the container as one tar.
+
+        Missing members are skipped (tar --ignore-failed-read) so optional files such as
+        profile.log don't fail the copy; callers check for the files they require.
+        rename maps a member's top-level name to the name it gets under host_dest.
+        """
         container_ref = self.docker_id or self.docker_name
         if not container_ref:
             raise RuntimeError("Docker container is not initialized. Call start_docker() first.")
 
-        to_abs = os.path.abspath(to_path)
-        os.makedirs(os.path.dirname(to_abs) or to_abs, exist_ok=True)
-        src = f"{container_ref}:{from_path}"
-        cp = subprocess.run(["docker", "cp", src, to_abs], capture_output=True, text=True)
-        if cp.returncode != 0:
-            raise RuntimeError(f"Failed to copy '{src}' to host '{to_abs}': {cp.stderr.strip()}")
-        print(f"Copied from container: {from_path} -> {to_abs}")
+        dest = os.path.abspath(host_dest)
+        os.makedirs(dest, exist_ok=True)
+        cmd = [
+            "docker", "exec", container_ref,
+            "tar", "-cf", "-", "--ignore-failed-read", "-C", container_src, *(members or ["."]),
+        ]
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err)
+            assert proc.stdout is not None
+            try:
+                with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+                    if rename:
+                        for ti in tar:
+                            head, sep, rest = ti.name.partition("/")
+                            if head in rename:
+                                ti.name = rename[head] + sep + rest
+                            tar.extract(ti, dest, filter="data")
+                    else:
+                        tar.extractall(dest, filter="data")
+            finally:
+                proc.stdout.close()
+            rc = proc.wait()
+            if rc != 0:
+                err.seek(0)
+                raise RuntimeError(f"Failed to stream '{container_ref}:{container_src}' to host '{dest}': {err.read().decode(errors='ignore').strip()}")
+        print(f"Copied from container: {container_src} -> {dest}")
+
+    def _copy_out_bucket(self, container_bucket: str, host_prof_bucket: Path) -> None:
+        """Copy a bucket's merged.profdata (and profile.log if present) back to the host."""
+        try:
+            self.bulk_copy_from_docker(container_bucket, str(host_prof_bucket), ["merged.profdata", "profile.log"])
+            if not (host_prof_bucket / "merged.profdata").exists():
+                print(f"[WARN] merged.profdata was not produced for {host_prof_bucket.name}")
+        except RuntimeError as e:
+            print(f"[WARN] Failed to copy profraws for {host_prof_bucket.name}: {e}")
 
     def exec_in_docker(self, args: List[str], workdir: Optional[str] = None) -> subprocess.CompletedProcess[str]:
         container_ref = self.docker_id or self.docker_name
         if not container_ref:
             raise RuntimeError("Docker container is not initialized. Call start_docker() first.")
+        # Prefer the persistent shell: one pipe round-trip instead of a new docker exec process
+        with self._shell_lock:
+            if self._shell is not None and self._shell.poll() is None:
+                try:
+                    rc, out, err = self._sh(shlex.join(args), workdir)
+                    return subprocess.CompletedProcess(args, rc, out, err)
+                except (BrokenPipeError, RuntimeError):
+                    self._close_shell()
+        if self._container is not None:
+            res = self._container.exec_run(args, workdir=workdir, demux=True)
+            out, err = res.output if res.output else (None, None)
+            return subprocess.CompletedProcess(
+                args, res.exit_code,
+                (out or b"").decode("utf-8", errors="replace"),
+                (err or b"").decode("utf-8", errors="replace"),
+            )
         cmd = ["docker", "exec"]
         if workdir:
             cmd += ["-w", workdir]
@@ -304,6 +746,24 @@ class DLLCovCollector:
         cmd += args
         return subprocess.run(cmd, capture_output=True, text=True)
 
+    def exec_in_docker_to_file(self, args: List[str], log_path: str, workdir: Optional[str] = None) -> int:
+        """Run a command in the container, streaming its stdout+stderr straight into log_path.
+
+        Unlike exec_in_docker, nothing is buffered in memory, so chatty commands (the driver)
+        don't grow this process's RSS. Returns the exit code.
+        """
+        container_ref = self.docker_id or self.docker_name
+        if not container_ref:
+            raise RuntimeError("Docker container is not initialized. Call start_docker() first.")
+        cmd = ["docker", "exec"]
+        if workdir:
+            cmd += ["-w", workdir]
+        cmd.append(container_ref)
+        cmd += args
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with open(log_path, "wb") as log:
+            return subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT).returncode
+
     # ---- Coverage utilities ----
     def _find_tool(self, names: List[str], probe_args: Optional[List[str]] = None) -> Optional[str]:
         """Return the first available tool name inside the container by probing it.
@@ -313,14 +773,26 @@ class DLLCovCollector:
         Defaults to ["--version"].
         """
         probe = probe_args or ["--version"]
-        for n in names:
-            res = self.exec_in_docker([n, *probe])  # type: ignore[list-item]
-            if res.returncode == 0:
-                return n
-        return None
+        key = (tuple(names), tuple(probe))
+        if key in self._tool_cache:
+            return self._tool_cache[key]
+        # Probe every candidate in one exec; the first one that answers wins
+        probe_cmd = shlex.join(probe)
+        script = "; ".join(
+            f"{shlex.quote(n)} {probe_cmd} >/dev/null 2>&1 && {{ echo {shlex.quote(n)}; exit 0; }}" for n in names
+        ) + "; exit 1"
+        res = self.exec_in_docker(["bash", "-c", script])
+        found = res.stdout.strip().splitlines()[-1] if res.returncode == 0 and res.stdout.strip() else None
+        self._tool_cache[key] = found
+        return found
 
     def _find_libtorch(self) -> Optional[str]:
         """Attempt to locate libtorch.so inside the container (preferred binary for llvm-cov)."""
+        if self._libtorch is None:
+            self._libtorch = self._locate_libtorch() or ""
+        return self._libtorch or None
+
+    def _locate_libtorch(self) -> Optional[str]:
         # Prefer libtorch.so if present (as requested)
         preferred = "/root/pytorch/build/lib/libtorch_cpu.so"
         chk = self.exec_in_docker(["bash", "-lc", f"test -f {preferred}"])
@@ -379,94 +851,245 @@ class DLLCovCollector:
         # Default to PyTorch
         return ["aten/src/ATen/native"]
 
-    def _merge_profdata_in_container(self, out_path: str, inputs: List[str]) -> None:
+    def _merge_profdata_cmd(self, out_path: str, inputs: List[str]) -> List[str]:
         # Prefer version aligned with the image; include 14 for TF builds on Ubuntu 22.04
         profdata_candidates = ["llvm-profdata-18", "llvm-profdata-17", "llvm-profdata-16", "llvm-profdata-15", "llvm-profdata-14", "llvm-profdata"]
         tool = self._find_tool(profdata_candidates, probe_args=["merge", "-help"])
         if not tool:
             raise RuntimeError("llvm-profdata not found in container")
-        cmd = [tool, "merge", "--num-threads=0", "--failure-mode=all", "-sparse", "-o", out_path] + inputs
-        res = self.exec_in_docker(cmd)
-        if res.returncode != 0:
-            raise RuntimeError(f"llvm-profdata merge failed: {res.stderr}\n{res.stdout}")
+        return [tool, "merge", "--num-threads=0", "--failure-mode=all", "-sparse", "-o", out_path] + inputs
 
-    def _llvm_cov_show_html(self, binaries: List[str], instr_profile: str, html_dir: str, path_equivalence: Optional[str] = None) -> None:
+    def _llvm_cov_show_cmd(self, binaries: List[str], instr_profile: str, html_dir: str, path_equivalence: Optional[str] = None) -> List[str]:
         # Prefer version aligned with the image; include 14 for TF builds on Ubuntu 22.04
         cov_candidates = ["llvm-cov-18", "llvm-cov-17", "llvm-cov-16", "llvm-cov-15", "llvm-cov-14", "llvm-cov"]
         tool = self._find_tool(cov_candidates, probe_args=["show", "-help"])
         if not tool:
             raise RuntimeError("llvm-cov not found in container")
-        # ensure output dir exists and is empty
-        self.exec_in_docker(["bash", "-lc", f"rm -rf {html_dir} && mkdir -p {html_dir}"])
         cmd = [tool, "show", *binaries, "--show-branches=count", f"--instr-profile={instr_profile}", "-format=html", f"-output-dir={html_dir}"]
         if path_equivalence:
             cmd.append(f"-path-equivalence={path_equivalence}")
+        return cmd
+
+    def _llvm_cov_show_html(self, binaries: List[str], instr_profile: str, html_dir: str, path_equivalence: Optional[str] = None) -> None:
+        cmd = self._llvm_cov_show_cmd(binaries, instr_profile, html_dir, path_equivalence)
+        # ensure output dir exists and is empty
+        self.exec_in_docker(["bash", "-lc", f"rm -rf {html_dir} && mkdir -p {html_dir}"])
         res = self.exec_in_docker(cmd)
         if res.returncode != 0:
             raise RuntimeError(f"llvm-cov show failed: {res.stderr}\n{res.stdout}")
 
+    def _llvm_cov_report_cmd(self, binaries: List[str], instr_profile: str, path_equivalence: Optional[str] = None) -> List[str]:
+        # Same tool as `show`; `report` prints only the per-file summary table
+        cov_candidates = ["llvm-cov-18", "llvm-cov-17", "llvm-cov-16", "llvm-cov-15", "llvm-cov-14", "llvm-cov"]
+        tool = self._find_tool(cov_candidates, probe_args=["show", "-help"])
+        if not tool:
+            raise RuntimeError("llvm-cov not found in container")
+        cmd = [tool, "report", *binaries, f"--instr-profile={instr_profile}"]
+        if path_equivalence:
+            cmd.append(f"-path-equivalence={path_equivalence}")
+        return cmd
+
+    def _finish_bucket_in_container(
+        self,
+        bucket_inputs: Optional[str],
+        bucket_prof: str,
+        cumulative_prof: str,
+        binaries: List[str],
+        path_equivalence: Optional[str] = None,
+    ) -> str:
+        """Run every post-driver step for one bucket as a single shell script.
+
+        Removes the bucket's inputs (unless None, e.g. a read-only mount), folds bucket_prof into cumulative_prof (merge + mv, or cp
+        for the first bucket) and returns the `llvm-cov report` table for the cumulative
+        profile. Failures to update the cumulative profile raise RuntimeError as before;
+        report failures raise _CoverageStepError so callers can treat them as non-fatal.
+        """
+        q = shlex.quote
+        tmp_out = f"{os.path.dirname(cumulative_prof)}/cumulative.tmp.profdata"
+        merge = shlex.join(self._merge_profdata_cmd(tmp_out, [cumulative_prof, bucket_prof]))
+        report = shlex.join(self._llvm_cov_report_cmd(binaries, cumulative_prof, path_equivalence))
+        # stdout carries only our markers and the report; other tool output goes to stderr
+        script = "\n".join([
+            f"rm -rf {q(bucket_inputs)}; echo {_STEP_RM}$?" if bucket_inputs else f"echo {_STEP_RM}0",
+            f"if [ -f {q(cumulative_prof)} ]; then",
+            f"  {merge} >&2 || exit {_RC_MERGE}",
+            f"  mv -f {q(tmp_out)} {q(cumulative_prof)} || exit {_RC_MV}",
+            "else",
+            f"  cp -f {q(bucket_prof)} {q(cumulative_prof)} || exit {_RC_CP}",
+            "fi",
+            f"echo {_STEP_REPORT}",
+            f"{report} || exit {_RC_REPORT}",
+        ])
+        # Not a login shell: tools must resolve exactly as they did when _find_tool probed them
+        res = self.exec_in_docker(["bash", "-c", script])
+        head, _sep, report_text = res.stdout.partition(f"{_STEP_REPORT}\n")
+        rm_rc = head.split(_STEP_RM, 1)[1].strip() if _STEP_RM in head else "?"
+        if rm_rc != "0":
+            print(f"[WARN] Failed to clean input root {bucket_inputs} (rc={rm_rc})")
+        if res.returncode == _RC_MERGE:
+            raise RuntimeError(f"llvm-profdata merge failed: {res.stderr}")
+        if res.returncode == _RC_MV:
+            raise RuntimeError(f"Failed to update cumulative profdata: {res.stderr}")
+        if res.returncode == _RC_CP:
+            raise RuntimeError(f"Failed to init cumulative profdata: {res.stderr}")
+        if res.returncode != 0:
+            raise _CoverageStepError(f"llvm-cov report failed: {res.stderr}")
+        return report_text
+
     @staticmethod
-    def extract_coverage_data(html_content: str, required_substrings: List[str]) -> Tuple[List[Tuple[str, int, int]], int, int]:
+    def extract_report_coverage(report: str, required_substrings: List[str]) -> Tuple[List[Tuple[str, int, int]], int, int]:
         """
-        Parse llvm-cov HTML index and collect covered lines for files whose path
-        contains ALL required_substrings (logical AND). Returns:
-            - list of (path, covered_lines, total_lines)
+        Parse `llvm-cov report` output and collect branch coverage for files whose path
+        contains ALL required_substrings (logical AND). This is the Branch Coverage column
+        (tds[4]) the llvm-cov HTML index used to be parsed for: covered branches are
+        Branches minus Missed Branches. Returns:
+            - list of (path, covered, total)
             - sum_covered
             - sum_total
         """
-        # Fallback simple parser if BeautifulSoup is unavailable
-        if BeautifulSoup is None or Tag is None:
-            results: List[Tuple[str, int, int]] = []
-            sum_cov = 0
-            sum_tot = 0
-            # Heuristic pairing
-            # Find tuples like: some path text followed by (covered/total)
-            link_texts = re.findall(r">([^<>]+)</a>", html_content)
-            nums = re.findall(r"\((\d+)/(\d+)\)", html_content)
-            for path, (cov, tot) in zip(link_texts, nums):
-                if required_substrings and not all(sub in path for sub in required_substrings):
-                    continue
-                c = int(cov)
-                t = int(tot)
-                results.append((path, c, t))
-                sum_cov += c
-                sum_tot += t
-            return results, sum_cov, sum_tot
-
-        soup = BeautifulSoup(html_content, 'html.parser')
-        rows = soup.find_all('tr', class_='light-row')
-
-        results = []
+        results: List[Tuple[str, int, int]] = []
         sum_cov = 0
         sum_tot = 0
-
-        for row in rows:
-            if not isinstance(row, Tag):
-                continue
-            tds = [td for td in row.find_all('td') if isinstance(td, Tag)]
-            if len(tds) < 5:
+        path_filter = _substring_filter(required_substrings)
+        ncols = total_idx = missed_idx = -1
+        for line in report.splitlines():
+            if ncols < 0:
+                # Header columns are separated by 2+ spaces ("Missed Branches" is one column)
+                if line.startswith("Filename"):
+                    cols = re.split(r"\s{2,}", line.strip())[1:]
+                    if "Branches" not in cols or "Missed Branches" not in cols:
+                        raise RuntimeError("llvm-cov report has no branch coverage columns")
+                    ncols, total_idx, missed_idx = len(cols), cols.index("Branches"), cols.index("Missed Branches")
                 continue
-            link = tds[0].find('a')
-            if not isinstance(link, Tag):
+            if not line.strip() or line.startswith("-") or line.startswith("TOTAL"):
                 continue
-            path = link.get_text(strip=True)
-            if required_substrings and not all(sub in path for sub in required_substrings):
+            parts = line.split()
+            if len(parts) <= ncols:
                 continue
-            pre_tag = tds[4].find('pre')
-            if not pre_tag:
+            path = " ".join(parts[:-ncols])
+            if path_filter and not path_filter.match(path):
                 continue
-            coverage_text = pre_tag.get_text(strip=True)
-            m = re.search(r"\((\d+)/(\d+)\)", coverage_text)
-            if not m:
+            nums = parts[-ncols:]
+            try:
+                total = int(nums[total_idx])
+                covered = total - int(nums[missed_idx])
+            except ValueError:
                 continue
-            covered = int(m.group(1))
-            total = int(m.group(2))
             results.append((path, covered, total))
             sum_cov += covered
             sum_tot += total
-
+        if ncols < 0:
+            raise RuntimeError("Unrecognized llvm-cov report output")
         return results, sum_cov, sum_tot
 
+    def _stage_container(self, container_root: str, inputs_root: str, profraw_root: str) -> str:
+        """Create the working directories and copy the drivers into this collector's container.
+
+        Returns the container path of the orchestrator driver.
+        """
+        # Prepare container directories
+        for d in (container_root, inputs_root, profraw_root):
+            mk = self.exec_in_docker(["mkdir", "-p", d])
+            if mk.returncode != 0:
+                raise RuntimeError(f"Failed to create {d} in container: {mk.stderr.strip()}")
+
+        # Copy orchestrator driver (acetest_driver.py or titanfuzz_driver.py) into container once
+        driver_host = os.path.join(os.path.dirname(__file__), self.driver)
+        if not os.path.exists(driver_host):
+            raise FileNotFoundError(f"Driver not found: {driver_host}")
+        driver_container = f"{container_root}/{self.driver}"
+        self.copy_to_docker(driver_host, driver_container)
+        # ...and the helpers it imports from its own directory
+        common_host = os.path.join(os.path.dirname(driver_host), "_driver_common.py")
+        if not os.path.exists(common_host):
+            raise FileNotFoundError(f"Driver helpers not found: {common_host}")
+        self.copy_to_docker(common_host, f"{os.path.dirname(driver_container)}/_driver_common.py")
+        # Copy framework-specific simple driver(s)
+        scripts_dir = os.path.join(os.path.dirname(__file__), "scripts")
+        torch_driver_host = os.path.join(scripts_dir, "torch_driver.py")
+        torch_driver = f"{container_root}/scripts/torch_driver.py"
+        if os.path.exists(torch_driver_host):
+            self.copy_to_docker(torch_driver_host, torch_driver)
+        tf_driver_host = os.path.join(scripts_dir, "tf_driver.py")
+        tf_driver = f"{container_root}/scripts/tf_driver.py"
+        if os.path.exists(tf_driver_host):
+            self.copy_to_docker(tf_driver_host, tf_driver)
+        return driver_container
+
+    def _run_driver(self, driver_container: str, container_root: str, bucket_label: str, host_prof_bucket: Path) -> None:
+        """Run the driver over a staged bucket; output goes to host_prof_bucket/driver.log."""
+        driver_log = host_prof_bucket / "driver.log"
+        rc = self.exec_in_docker_to_file([
+            "python", driver_container,
+            "--inputs-dir", f"{container_root}/inputs/{bucket_label}",
+            "--profraw-root", f"{container_root}/profraw/{bucket_label}",
+            "--profdata-out", f"{container_root}/profraw/{bucket_label}/merged.profdata",
+            "--jobs", f"{self.num_parallel}",
+            "--timeout-sec", f"{self.itv*2}",
+            "--dll", self.dll,
+        ], str(driver_log), workdir=container_root)
+        if rc != 0:
+            print(f"[WARN] Driver failed for bucket {bucket_label} (rc={rc}); see {driver_log}")
+
+    def _spawn_worker(self, index: int) -> "DLLCovCollector":
+        """Start a sibling container (same image, name suffixed with -<index>) for parallel driver runs."""
+        worker = copy.copy(self)
+        worker.docker_name = f"{self.docker_name}-{index}"
+        worker.docker_id = ""
+        worker._shell = None
+        worker._container = None
+        worker._shell_lock = threading.Lock()
+        worker._workers = []
+        worker.start_docker()
+        return worker
+
+    def _run_buckets_parallel(self, result_root: Path, labels: List[str], host_prof_root: Path, container_root: str) -> None:
+        """Run the driver for each bucket in labels across num_containers containers.
+
+        Each bucket is staged, executed and copied back to host_prof_root/<bucket> by whichever
+        container is free; the primary container (self) is one of them. Afterwards the buckets
+        look exactly like resumed ones to the sequential cumulative pass in collect().
+        """
+        inputs_root = f"{container_root}/inputs"
+        profraw_root = f"{container_root}/profraw"
+        k = min(self.num_containers, len(labels))
+        for i in range(1, k):
+            self._workers.append(self._spawn_worker(i))
+        pool: "queue.Queue[Tuple[DLLCovCollector, str]]" = queue.Queue()
+        pool.put((self, f"{container_root}/{self.driver}"))
+        for w in self._workers:
+            pool.put((w, w._stage_container(container_root, inputs_root, profraw_root)))
+
+        def run_one(label: str) -> None:
+            c, driver_container = pool.get()
+            try:
+                print(f"Processing bucket: {label} (container {c.docker_name})")
+                host_prof_bucket = host_prof_root / label
+                host_prof_bucket.mkdir(parents=True, exist_ok=True)
+                if not c.bind_mount:
+                    c.bulk_copy_to_docker(str(result_root), inputs_root, [label])
+                c._run_driver(driver_container, container_root, label, host_prof_bucket)
+                if not c.bind_mount:
+                    c._copy_out_bucket(f"{profraw_root}/{label}", host_prof_bucket)
+                    c.exec_in_docker(["rm", "-rf", f"{inputs_root}/{label}"])
+            finally:
+                pool.put((c, driver_container))
+
+        with ThreadPoolExecutor(max_workers=k) as ex:
+            for fut in [ex.submit(run_one, label) for label in labels]:
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"[WARN] Parallel bucket run failed: {e}")
+
+    def _remove_workers(self) -> None:
+        workers, self._workers = self._workers, []
+        for w in workers:
+            try:
+                w.rm_docker()
+            except Exception as e:
+                print(f"[WARN] {e}")
+
     def collect(self):
         try:
             # 1) Determine interval directories: if target already has interval buckets (\d+-\d+), use them;
@@ -474,8 +1097,9 @@ class DLLCovCollector:
             use_existing = False
             if os.path.isdir(self.target):
                 try:
-                    names = [d for d in os.listdir(self.target) if os.path.isdir(os.path.join(self.target, d))]
-                    use_existing = any(re.match(r"^\d+-\d+$", n) for n in names)
+                    with os.scandir(self.target) as it:
+                        names = [e.name for e in it if e.is_dir(follow_symlinks=False)]
+                    use_existing = any(_BUCKET_RE.fullmatch(n) for n in names)
                 except Exception:
                     use_existing = False
 
@@ -490,53 +1114,91 @@ class DLLCovCollector:
                 result_root = Path(self.result_dir)
                 baseline_name = result_root.name
 
-            # 2) Ensure docker image/container
-            self.check_image()
-            self.start_docker()
-
             container_root = "/root"
             inputs_root = f"{container_root}/inputs"
             profraw_root = f"{container_root}/profraw"
+            host_prof_root = Path(self.output) / "profdata" / baseline_name
+            if self.bind_mount:
+                # The container reads bucket inputs and writes profdata straight through to the host
+                host_prof_root.mkdir(parents=True, exist_ok=True)
+                self._data_mounts = [
+                    (str(result_root.resolve()), inputs_root, "ro"),
+                    (str(host_prof_root.resolve()), profraw_root, "rw"),
+                ]
 
-            # Prepare container directories
-            for d in (container_root, inputs_root, profraw_root):
-                mk = self.exec_in_docker(["mkdir", "-p", d])
-                if mk.returncode != 0:
-                    raise RuntimeError(f"Failed to create {d} in container: {mk.stderr.strip()}")
-
-            # Copy orchestrator driver (acetest_driver.py or titanfuzz_driver.py) into container once
-            driver_host = os.path.join(os.path.dirname(__file__), self.driver)
-            if not os.path.exists(driver_host):
-                raise FileNotFoundError(f"Driver not found: {driver_host}")
-            driver_container = f"{container_root}/{self.driver}"
-            self.copy_to_docker(driver_host, driver_container)
-            # Copy framework-specific simple driver(s)
-            scripts_dir = os.path.join(os.path.dirname(__file__), "scripts")
-            torch_driver_host = os.path.join(scripts_dir, "torch_driver.py")
-            torch_driver = f"{container_root}/scripts/torch_driver.py"
-            if os.path.exists(torch_driver_host):
-                self.copy_to_docker(torch_driver_host, torch_driver)
-            tf_driver_host = os.path.join(scripts_dir, "tf_driver.py")
-            tf_driver = f"{container_root}/scripts/tf_driver.py"
-            if os.path.exists(tf_driver_host):
-                self.copy_to_docker(tf_driver_host, tf_driver)
+            # 2) Ensure docker image/container
+            self.check_image()
+            self.start_docker()
+
+            driver_container = self._stage_container(container_root, inputs_root, profraw_root)
 
             # 3) For each interval bucket, copy inputs and execute all .py (single driver call per bucket)
             # Bucket directories directly under self.result_dir. Sort numerically by label start-end
             # to ensure processing order matches printed order (cumulative coverage grows monotonically).
-            buckets_tmp: List[Tuple[Path, int, int]] = []
-            for p in result_root.iterdir():
-                if not p.is_dir():
-                    continue
-                m = re.match(r"^(\d+)-(\d+)$", p.name)
-                if not m:
-                    continue
-                buckets_tmp.append((p, int(m.group(1)), int(m.group(2))))
-            interval_dirs = [p for (p, _a, _b) in sorted(buckets_tmp, key=lambda t: (t[1], t[2]))]
-
-            # Prepare cumulative profdata and coverage output paths inside container
+            bucket_keys: Dict[str, BucketKey] = {}
+            buckets_tmp: List[Tuple[BucketKey, "os.DirEntry[str]"]] = []
+            with os.scandir(result_root) as it:
+                for e in it:
+                    if not e.is_dir(follow_symlinks=False):
+                        continue
+                    m = _BUCKET_RE.fullmatch(e.name)
+                    if not m:
+                        continue
+                    key = BucketKey(int(m.group(1)), int(m.group(2)))
+                    bucket_keys[e.name] = key
+                    buckets_tmp.append((key, e))
+            interval_dirs = [e for (_k, e) in sorted(buckets_tmp, key=lambda t: t[0])]
+
+            # Stream every bucket that still needs a driver run into the container in one go;
+            # buckets with a host-side merged.profdata are resumed and don't need their inputs.
+            to_run = [p.name for p in interval_dirs if not (host_prof_root / p.name / "merged.profdata").exists()]
+            if self.num_containers > 1 and to_run:
+                # Driver runs are independent per bucket: spread them over sibling containers, then
+                # let the loop below treat every bucket as resumed for the ordered cumulative merge.
+                # Buckets that still have no host-side profdata fall through to a normal run.
+                self._run_buckets_parallel(result_root, to_run, host_prof_root, container_root)
+                to_run = [label for label in to_run if not (host_prof_root / label / "merged.profdata").exists()]
+            to_run_set = set(to_run)
+            # Bind-mounted inputs/outputs need no staging at all
+            staged = not self.bind_mount
+            pipeline = self.pipeline and staged
+            if to_run and staged and not pipeline:
+                self.bulk_copy_to_docker(str(result_root), inputs_root, to_run)
+
+            # With --pipeline, copy-in of upcoming buckets and copy-out of finished ones run on
+            # worker threads while the driver (the bottleneck) runs here. maxsize=2 bounds how many
+            # buckets are staged inside the container at once.
+            copy_in_q: "queue.Queue[Tuple[str, Optional[Exception]]]" = queue.Queue(maxsize=2)
+            copy_out_q: "queue.Queue[Optional[Tuple[str, Path]]]" = queue.Queue(maxsize=2)
+            workers: List[threading.Thread] = []
+            if pipeline:
+                def copy_in_worker() -> None:
+                    for label in to_run:
+                        try:
+                            self.bulk_copy_to_docker(str(result_root), inputs_root, [label])
+                            copy_in_q.put((label, None))
+                        except Exception as e:
+                            copy_in_q.put((label, e))
+
+                def copy_out_worker() -> None:
+                    while True:
+                        item = copy_out_q.get()
+                        if item is None:
+                            return
+                        self._copy_out_bucket(*item)
+
+                workers = [
+                    threading.Thread(target=copy_in_worker, name="copy-in", daemon=True),
+                    threading.Thread(target=copy_out_worker, name="copy-out", daemon=True),
+                ]
+                for w in workers:
+                    w.start()
+
+            # Prepare cumulative profdata and coverage output paths inside container; with a
+            # bind-mounted profraw root a previous run's cumulative profile must not be reused
             cumulative_prof = f"{profraw_root}/cumulative.profdata"
-            coverage_summary: Dict[str, int] = {}
+            self.exec_in_docker(["rm", "-f", cumulative_prof, f"{profraw_root}/cumulative.tmp.profdata"])
+            coverage_summary: Dict[BucketKey, int] = {}
 
             # Locate binaries once per run
             coverage_binaries: List[str]
@@ -550,7 +1212,8 @@ class DLLCovCollector:
                     raise RuntimeError("libtorch.so not found in container")
                 coverage_binaries = [libtorch]
 
-            html_root = f"{container_root}/cov-html"
+            html_root = self.html_container_root
+            path_equivalence = "/proc/self/cwd/,/usr/src/tensorflow/" if self.dll == "tf" else None
             mkh = self.exec_in_docker(["mkdir", "-p", html_root])
             if mkh.returncode != 0:
                 raise RuntimeError(f"Failed to create html dir: {mkh.stderr.strip()}")
@@ -558,7 +1221,7 @@ class DLLCovCollector:
             for bucket_dir in interval_dirs:
                 print(f"Processing bucket: {bucket_dir.name}")
                 bucket_label = bucket_dir.name
-                host_prof_bucket = Path(self.output) / "profdata" / baseline_name / bucket_label
+                host_prof_bucket = host_prof_root / bucket_label
                 host_prof_bucket.mkdir(parents=True, exist_ok=True)
                 host_prof_file = host_prof_bucket / "merged.profdata"
 
@@ -567,65 +1230,47 @@ class DLLCovCollector:
                 if mkp.returncode != 0:
                     raise RuntimeError(f"Failed to mkdir for profraw: {mkp.stderr.strip()}")
 
-                if host_prof_file.exists():
-                    # Reuse existing result; copy into container
+                if bucket_label not in to_run_set:
+                    # Reuse existing result; copy into container (already visible when bind-mounted)
                     print(f"[resume] Found existing profdata for {bucket_label}, reusing")
-                    self.copy_to_docker(str(host_prof_file), f"{profraw_root}/{bucket_label}/merged.profdata")
+                    if staged:
+                        self.copy_to_docker(str(host_prof_file), f"{profraw_root}/{bucket_label}/merged.profdata")
                 else:
-                    # Copy this interval into container and run driver
-                    container_bucket_dir = f"{inputs_root}/{bucket_label}"
-                    self.copy_to_docker(str(bucket_dir), inputs_root)
-                    run = self.exec_in_docker([
-                        "python", driver_container,
-                        "--inputs-dir", container_bucket_dir,
-                        "--profraw-root", f"{profraw_root}/{bucket_label}",
-                        "--profdata-out", f"{profraw_root}/{bucket_label}/merged.profdata",
-                        "--jobs", f"{self.num_parallel}",
-                        "--timeout-sec", f"{self.itv*2}",
-                        "--dll", self.dll,
-                    ], workdir=container_root)
-                    if run.returncode != 0:
-                        print(f"[WARN] Driver failed for bucket {bucket_label}: {run.stderr.strip()}\n{run.stdout}")
+                    if pipeline:
+                        # Buckets are staged in to_run order; wait for this one
+                        staged_label, staged_err = copy_in_q.get()
+                        if staged_err is not None:
+                            print(f"[WARN] Failed to copy inputs for {staged_label}: {staged_err}")
+                    # Inputs for this interval are already staged in the container; run driver
+                    self._run_driver(driver_container, container_root, bucket_label, host_prof_bucket)
                     # Copy fresh results to host for future resume
-                    try:
-                        self.copy_from_docker(f"{profraw_root}/{bucket_label}/merged.profdata", str(host_prof_bucket))
-                        self.copy_from_docker(f"{profraw_root}/{bucket_label}/profile.log", str(host_prof_bucket))
-                    except RuntimeError as e:
-                        print(f"[WARN] Failed to copy profraws for {bucket_label}: {e}")
+                    if pipeline:
+                        copy_out_q.put((f"{profraw_root}/{bucket_label}", host_prof_bucket))
+                    elif staged:
+                        self._copy_out_bucket(f"{profraw_root}/{bucket_label}", host_prof_bucket)
+                    elif not host_prof_file.exists():
+                        print(f"[WARN] merged.profdata was not produced for {bucket_label}")
                 
-                # clean input root
-                rm = self.exec_in_docker(["rm", "-rf", inputs_root])
-                if rm.returncode != 0:
-                    print(f"[WARN] Failed to clean input root: {rm.stderr.strip()}")
-
-                # Merge cumulatively: previous cumulative + current bucket -> new cumulative
+                # Clean this bucket's inputs, fold it into the cumulative profile and summarize
+                # the cumulative profile with `llvm-cov report`, all in one container round-trip
                 bucket_prof = f"{profraw_root}/{bucket_label}/merged.profdata"
-                exists = self.exec_in_docker(["bash", "-lc", f"test -f {cumulative_prof}"])
-                if exists.returncode == 0:
-                    tmp_out = f"{profraw_root}/cumulative.tmp.profdata"
-                    self._merge_profdata_in_container(tmp_out, [cumulative_prof, bucket_prof])
-                    mv = self.exec_in_docker(["bash", "-lc", f"mv -f {tmp_out} {cumulative_prof}"])
-                    if mv.returncode != 0:
-                        raise RuntimeError(f"Failed to update cumulative profdata: {mv.stderr}")
-                else:
-                    cp = self.exec_in_docker(["bash", "-lc", f"cp -f {bucket_prof} {cumulative_prof}"])
-                    if cp.returncode != 0:
-                        raise RuntimeError(f"Failed to init cumulative profdata: {cp.stderr}")
+                try:
+                    report_text = self._finish_bucket_in_container(
+                        f"{inputs_root}/{bucket_label}" if staged else None,
+                        bucket_prof,
+                        cumulative_prof,
+                        coverage_binaries,
+                        path_equivalence=path_equivalence,
+                    )
+                except _CoverageStepError as e:
+                    print(f"[WARN] Coverage computation failed for {bucket_label}: {e}")
+                    continue
 
-                # Generate HTML coverage for cumulative profile and parse coverage
-                html_dir = f"{html_root}/{bucket_label}"
+                # Parse per-file branch coverage from the report
                 try:
-                    if self.dll == "tf":
-                        self._llvm_cov_show_html(coverage_binaries, cumulative_prof, html_dir, path_equivalence="/proc/self/cwd/,/usr/src/tensorflow/")
-                    else:
-                        self._llvm_cov_show_html(coverage_binaries, cumulative_prof, html_dir)
-                    cat = self.exec_in_docker(["bash", "-lc", f"cat {html_dir}/index.html"])
-                    if cat.returncode != 0:
-                        raise RuntimeError(f"Failed to read index.html: {cat.stderr}")
-                    html_content = cat.stdout
                     filters = self._required_substrings()
-                    rows, sum_cov, sum_tot = self.extract_coverage_data(html_content, filters)
-                    coverage_summary[bucket_label] = sum_cov
+                    rows, sum_cov, sum_tot = self.extract_report_coverage(report_text, filters)
+                    coverage_summary[bucket_keys[bucket_label]] = sum_cov
 
                     # Generate a host-side text report per iteration
                     try:
@@ -651,23 +1296,31 @@ class DLLCovCollector:
                     print(f"[WARN] Coverage computation failed for {bucket_label}: {e}")
                 
                 # 4) Nothing else to copy if we resumed; fresh runs already copied above
+            # Drain pending copy-outs before reporting
+            if workers:
+                copy_out_q.put(None)
+                for w in workers:
+                    w.join()
+            # Full HTML is rendered once, for the final cumulative profile (bind-mounted to the host)
+            if interval_dirs:
+                try:
+                    self._llvm_cov_show_html(coverage_binaries, cumulative_prof, f"{html_root}/final", path_equivalence=path_equivalence)
+                    print(f"HTML coverage report: {os.path.join(self.html_host_root, 'final', 'index.html')}")
+                except RuntimeError as e:
+                    print(f"[WARN] Final HTML report failed: {e}")
             # Print final per-bucket cumulative covered-line counts
-            if coverage_summary:
-                def key_fn(s: str) -> Tuple[int, int]:
-                    a, b = s.split('-')
-                    return (int(a), int(b))
-                for k in sorted(coverage_summary.keys(), key=key_fn):
-                    print(f"{k}: {coverage_summary[k]}")
+            for k in sorted(coverage_summary):
+                print(f"{k.label}: {coverage_summary[k]}")
             print("Success")
         except Exception as e:
             print("Fail:", e)
         finally:
-            # stop and remove the docker container
+            # Remove the container(s). `rm -f` kills and removes in one call; a separate
+            # `docker stop` would sit out its full grace period, since bash as PID 1
+            # ignores SIGTERM.
+            self._remove_workers()
             if self.docker_id:
-                try:
-                    self.stop_docker()
-                finally:
-                    self.rm_docker()
+                self.rm_docker()
 
 
 
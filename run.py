@@ -78,6 +78,24 @@ def build_parser() -> argparse.ArgumentParser:
         required=False,
         help="Maximum time horizon in seconds for interval buckets (e.g., 600 -> only 0-60, ..., 540-600). Use <=0 to disable cutoff.",
     )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap copying bucket inputs/results with driver execution (worker threads)",
+    )
+    parser.add_argument(
+        "--num-containers",
+        type=int,
+        default=1,
+        required=False,
+        help="Number of containers to run bucket drivers in concurrently (cumulative merge stays ordered)",
+    )
+    parser.add_argument(
+        "--bind-mount",
+        action="store_true",
+        help="Bind-mount the bucket tree (read-only) and profdata directory into the container instead of copying inputs/profdata in and out; "
+        "tests that write to relative paths fail on the read-only inputs",
+    )
     return parser
 
 
@@ -102,6 +120,9 @@ if __name__ == "__main__":
             "filter": str(parsed_args.filter),
             "num_parallel": parsed_args.num_parallel,
             "max_time_sec": parsed_args.max_time_sec,
+            "pipeline": parsed_args.pipeline,
+            "num_containers": parsed_args.num_containers,
+            "bind_mount": parsed_args.bind_mount,
         },
     )
     # Collector is a framework-agnostic base; subclasses provide specifics
@@ -117,6 +138,9 @@ if __name__ == "__main__":
             filter=parsed_args.filter,
             num_parallel=parsed_args.num_parallel,
             max_time_sec=parsed_args.max_time_sec,
+            pipeline=parsed_args.pipeline,
+            num_containers=parsed_args.num_containers,
+            bind_mount=parsed_args.bind_mount,
         )
         collector.collect()
     elif parsed_args.dll == "tf":
@@ -130,5 +154,8 @@ if __name__ == "__main__":
             filter=parsed_args.filter,
             num_parallel=parsed_args.num_parallel,
             max_time_sec=parsed_args.max_time_sec,
+            pipeline=parsed_args.pipeline,
+            num_containers=parsed_args.num_containers,
+            bind_mount=parsed_args.bind_mount,
         )
         collector.collect()
@@ -0,0 +1,359 @@
+"""
+Shared helpers for the subdir orchestrators (acetest_driver.py, titanfuzz_driver.py).
+
+  - THREAD_ENV: single-threaded runtime settings for every driver run
+  - warm / run_in_process: the --in-process warmed worker pools
+  - submit_bounded: a bounded window of pool tasks
+  - merge_profraws / find_profdata_tool: llvm-profdata merging
+  - default_jobs / worker_init: --jobs default and --pin-cpus
+
+cov.py copies this file into the container next to the drivers.
+"""
+
+import contextlib
+import ctypes
+import functools
+import importlib.util
+import io
+import os
+import shutil
+import signal
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, List, Tuple
+
+# Constrain threading/concurrency to 1 for PyTorch / TensorFlow and math libs
+THREAD_ENV = {
+	"OMP_NUM_THREADS": "1",
+	"OMP_THREAD_LIMIT": "1",
+	"MKL_NUM_THREADS": "1",
+	"OPENBLAS_NUM_THREADS": "1",
+	"NUMEXPR_NUM_THREADS": "1",
+	"BLIS_NUM_THREADS": "1",
+	"VECLIB_MAXIMUM_THREADS": "1",
+	# TensorFlow specific knobs
+	"TF_NUM_INTRAOP_THREADS": "1",
+	"TF_NUM_INTEROP_THREADS": "1",
+}
+
+
+# Per-worker state for --in-process mode, filled in by warm()
+_TIMEOUT = 180
+_DRIVER: Optional[ModuleType] = None
+_PROFILE_FLUSH: List[Any] = []
+_RUNNING_DIR = ""
+_HOME_CWD = ""
+
+
+class _SubdirTimeout(BaseException):
+	"""Raised by SIGALRM in an in-process worker.
+
+	Derives from BaseException so the drivers' per-file ``except Exception``
+	does not swallow it and the whole subdirectory is abandoned.
+	"""
+
+
+def _on_alarm(signum: int, frame: Any) -> None:
+	raise _SubdirTimeout()
+
+
+def _find_profile_flush() -> List[Any]:
+	"""Locate ``__llvm_profile_write_file`` in the loaded instrumented libraries."""
+	paths: List[Optional[str]] = [None]
+	try:
+		with open("/proc/self/maps") as fh:
+			for line in fh:
+				parts = line.split()
+				if len(parts) >= 6 and ".so" in parts[5] and parts[5] not in paths:
+					paths.append(parts[5])
+	except OSError:
+		pass
+	found: List[Any] = []
+	seen = set()
+	for path in paths:
+		try:
+			fn = getattr(ctypes.CDLL(path), "__llvm_profile_write_file")
+		except (OSError, AttributeError):
+			continue
+		addr = ctypes.cast(fn, ctypes.c_void_p).value
+		if addr not in seen:
+			seen.add(addr)
+			found.append(fn)
+	return found
+
+
+def warm(driver_path: str, timeout: int, prof_pattern: str, running_dir: str) -> None:
+	"""Initializer for --in-process workers: import the framework once per worker.
+
+	While a subdir runs, the worker keeps a marker file named after its pid in
+	running_dir holding the subdir path, so the parent can tell which subdirs
+	were in flight if the pool breaks.
+	"""
+	global _DRIVER, _PROFILE_FLUSH, _TIMEOUT, _RUNNING_DIR, _HOME_CWD
+	_TIMEOUT = timeout
+	_RUNNING_DIR = running_dir
+	_HOME_CWD = os.getcwd()
+	# The profile runtime reads LLVM_PROFILE_FILE when the instrumented library
+	# loads, so it has to be set before the driver imports torch/tf.
+	os.environ["LLVM_PROFILE_FILE"] = prof_pattern
+	os.environ.update(THREAD_ENV)
+	spec = importlib.util.spec_from_file_location(Path(driver_path).stem, driver_path)
+	assert spec is not None and spec.loader is not None
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	_DRIVER = module
+	_PROFILE_FLUSH = _find_profile_flush()
+	signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def _run_subdir_in_process(subdir_str: str) -> Tuple[str, int, str, str]:
+	"""Run the preloaded driver on a subdirectory inside a warmed worker.
+
+	Returns: (subdir, returncode, stdout, stderr)
+	"""
+	assert _DRIVER is not None
+	timeout = _TIMEOUT
+	out = io.StringIO()
+	err = io.StringIO()
+	rc = 1
+	# Run from the subdir, as subprocess mode does (cwd=subdir)
+	subdir_abs = os.path.abspath(subdir_str)
+	marker = os.path.join(_RUNNING_DIR, str(os.getpid()))
+	try:
+		with open(marker, "w") as fh:
+			fh.write(subdir_str)
+		with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+			signal.alarm(max(1, timeout))
+			try:
+				os.chdir(subdir_abs)
+				rc = _DRIVER.main(["--inputs-dir", subdir_abs])
+			finally:
+				signal.alarm(0)
+				os.chdir(_HOME_CWD)
+	except _SubdirTimeout:
+		rc = 124
+		err.write(f"Timeout after {timeout}s")
+	except Exception as e:
+		err.write(f"Exception: {e}")
+	finally:
+		# Counters are cumulative per worker; rewrite its profraw after every
+		# subdir so a later crash does not lose what has already run.
+		for flush in _PROFILE_FLUSH:
+			flush()
+		with contextlib.suppress(OSError):
+			os.unlink(marker)
+	return (subdir_str, rc, out.getvalue(), err.getvalue())
+
+
+def _take_running(running_dir: str) -> List[str]:
+	"""Subdirs whose marker is still in running_dir (in flight when workers died); clears them."""
+	found: List[str] = []
+	with os.scandir(running_dir) as it:
+		for e in it:
+			with contextlib.suppress(OSError):
+				with open(e.path) as fh:
+					found.append(fh.read())
+				os.unlink(e.path)
+	return found
+
+
+# Inputs per llvm-profdata call; larger sets are merged in chunks, then combined
+_MERGE_CHUNK = 512
+
+
+def submit_bounded(exe: ProcessPoolExecutor, fn: Callable[[Any], Any], items: Iterable[Any], window: int) -> Iterator[Tuple[Any, Future]]:
+	"""Run fn(item) for every item on exe, with at most window tasks in flight.
+
+	Yields (item, future) as each task completes; the next item is submitted
+	only then, so pending arguments and finished results are never all held at
+	once. A submit that fails (e.g. on a broken pool) yields a failed future.
+	"""
+	in_flight: Dict[Future, Any] = {}
+	for item in items:
+		if len(in_flight) >= window:
+			done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+			for fut in done:
+				yield (in_flight.pop(fut), fut)
+		try:
+			fut = exe.submit(fn, item)
+		except Exception as e:
+			fut = Future()
+			fut.set_exception(e)
+			yield (item, fut)
+			continue
+		in_flight[fut] = item
+	for fut in as_completed(in_flight):
+		yield (in_flight[fut], fut)
+
+
+def run_in_process(
+	subdirs: List[str],
+	jobs: int,
+	ctx: Any,
+	initializer: Optional[Callable[..., None]],
+	initargs: Tuple[Any, ...],
+	running_dir: str,
+) -> List[Tuple[str, int, str, str]]:
+	"""Run subdirs on warmed worker pools, replacing the pool whenever one breaks.
+
+	A test that segfaults or calls os._exit takes its worker down, and the
+	executor then fails everything still pending. Only subdirs that were
+	running at that moment are suspects: a single suspect is recorded as the
+	crash, several are re-run one at a time on a single-worker pool to find
+	it. Everything else is resubmitted to a fresh pool.
+	"""
+	results: List[Tuple[str, int, str, str]] = []
+	pending = list(subdirs)
+	isolate: List[str] = []
+	while pending or isolate:
+		if isolate:
+			batch, workers = [isolate.pop()], 1
+		else:
+			batch, workers, pending = pending, jobs, []
+		unfinished: List[str] = []
+		with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=initializer, initargs=initargs) as exe:
+			for sd, fut in submit_bounded(exe, _run_subdir_in_process, batch, workers * 4):
+				try:
+					results.append(fut.result())
+				except BrokenProcessPool:
+					unfinished.append(sd)
+				except Exception as e:
+					results.append((sd, 1, "", f"Exception: {e!r}"))
+		if not unfinished:
+			continue
+		suspects = set(_take_running(running_dir)) & set(unfinished)
+		if not suspects:
+			# Nothing was running: the workers could not start (e.g. the import failed)
+			results.extend((sd, 1, "", "Worker died: process pool broke before running it") for sd in unfinished)
+			continue
+		if len(suspects) == 1:
+			results.append((next(iter(suspects)), 1, "", "Worker died: the interpreter exited abruptly (crash or os._exit)"))
+		else:
+			isolate.extend(sorted(suspects))
+		pending.extend(sd for sd in unfinished if sd not in suspects)
+	return results
+
+
+def _merge_filelist(tool: str, inputs: List[str], out: Path, num_threads: int = 0) -> subprocess.CompletedProcess:
+	"""One llvm-profdata merge, with the inputs passed as a file list (-f) rather than argv."""
+	filelist = out.with_name(out.name + ".inputs")
+	filelist.write_text("".join(p + "\n" for p in inputs))
+	cmd = [tool, "merge", f"--num-threads={num_threads}", "--failure-mode=all", "-sparse", "-f", str(filelist), "-o", str(out)]
+	try:
+		return subprocess.run(cmd, capture_output=True, text=True)
+	finally:
+		filelist.unlink()
+
+
+def merge_profraws(tool: str, profraws: List[str], out: Path, jobs: int) -> subprocess.CompletedProcess:
+	"""Merge profraws into out, as a two-level tree when there are more than _MERGE_CHUNK.
+
+	Chunks are merged concurrently into intermediate profiles, which are then merged
+	into out. Like --failure-mode=all on a single merge, only chunks that all fail
+	make the whole merge fail.
+	"""
+	if len(profraws) <= _MERGE_CHUNK:
+		return _merge_filelist(tool, profraws, out)
+	chunks = [profraws[i:i + _MERGE_CHUNK] for i in range(0, len(profraws), _MERGE_CHUNK)]
+	parts = [out.with_name(f"{out.stem}.part{i}{out.suffix}") for i in range(len(chunks))]
+	try:
+		with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(chunks)))) as ex:
+			results = list(ex.map(lambda c, p: _merge_filelist(tool, c, p, num_threads=1), chunks, parts))
+		merged: List[str] = []
+		for part, res in zip(parts, results):
+			if res.returncode == 0 and part.exists():
+				merged.append(str(part))
+			else:
+				print(f"[driver] Partial merge into {part.name} failed: {res.stderr.strip()}", file=sys.stderr)
+		if not merged:
+			return results[0]
+		return _merge_filelist(tool, merged, out)
+	finally:
+		for part in parts:
+			try:
+				part.unlink()
+			except FileNotFoundError:
+				pass
+
+
+@functools.lru_cache(maxsize=None)
+def find_profdata_tool() -> Optional[str]:
+	candidates: List[Optional[str]] = [
+		os.environ.get("LLVM_PROFDATA"),
+		"llvm-profdata",
+		"llvm-profdata-18",
+		"llvm-profdata-17",
+		"llvm-profdata-16",
+		"llvm-profdata-15",
+		"llvm-profdata-14",
+	]
+	for c in candidates:
+		if not c:
+			continue
+		# Resolve on PATH instead of spawning each candidate to see whether it runs
+		path = shutil.which(c)
+		if path:
+			return path
+	return None
+
+
+def _usable_cpus() -> List[int]:
+	"""CPUs this process may run on (the container's cpuset, not the host's)."""
+	if hasattr(os, "sched_getaffinity"):
+		return sorted(os.sched_getaffinity(0))
+	return list(range(os.cpu_count() or 1))
+
+
+def _cgroup_cpu_limit() -> Optional[int]:
+	"""CPU quota of our cgroup (e.g. `docker run --cpus`), rounded up; None if unlimited."""
+	try:
+		# cgroup v2: "<quota> <period>" or "max <period>"
+		with open("/sys/fs/cgroup/cpu.max") as f:
+			quota, period = f.read().split()[:2]
+		return None if quota == "max" else max(1, -(-int(quota) // int(period)))
+	except (OSError, ValueError):
+		pass
+	try:
+		# cgroup v1: quota is -1 when unlimited
+		with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+			quota_us = int(f.read())
+		with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+			period_us = int(f.read())
+		return None if quota_us <= 0 else max(1, -(-quota_us // period_us))
+	except (OSError, ValueError):
+		return None
+
+
+def default_jobs() -> int:
+	jobs = len(_usable_cpus())
+	limit = _cgroup_cpu_limit()
+	if limit is not None:
+		jobs = min(jobs, limit)
+	return max(1, jobs)
+
+
+def _pin_worker(cpus: List[int], slot: Any, init: Optional[Callable[..., None]], initargs: Tuple[Any, ...]) -> None:
+	"""Worker initializer for --pin-cpus: bind this worker to the next CPU in cpus, then run init.
+
+	The affinity is inherited by the driver processes the worker starts.
+	"""
+	with slot.get_lock():
+		idx = slot.value
+		slot.value += 1
+	try:
+		os.sched_setaffinity(0, {cpus[idx % len(cpus)]})
+	except (AttributeError, OSError):
+		pass
+	if init is not None:
+		init(*initargs)
+
+
+def worker_init(pin: bool, ctx: Any, init: Optional[Callable[..., None]], initargs: Tuple[Any, ...]) -> Tuple[Optional[Callable[..., None]], Tuple[Any, ...]]:
+	"""(initializer, initargs) for a ProcessPoolExecutor, wrapping init in _pin_worker if pin."""
+	if not pin:
+		return init, initargs
+	return _pin_worker, (_usable_cpus(), ctx.Value("i", 0), init, initargs)
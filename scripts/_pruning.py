@@ -0,0 +1,206 @@
+"""
+Shared helpers for the valid_by_api pruning scripts.
+
+Used by intersect_and_prune_valid_by_api.py and prune_valid_by_api_with_apilist.py:
+  - iter_lines / read_lines / write_lines: API list I/O (one dotted API per line)
+  - build_keep: directories to keep for a list of APIs
+  - prune: delete every directory under a root that is not in the keep set
+
+All paths are plain, absolute path strings, so pruning is a set lookup rather
+than a resolve() per entry.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+
+
+def norm_path(path: Union[str, Path]) -> str:
+    # Lexical normalization only: no resolve(), so no readlink/lstat per call.
+    # The valid_by_api tree is assumed to be symlink-free (see check_valid_dir)
+    return os.path.normpath(os.path.abspath(os.fspath(path)))
+
+
+def check_valid_dir(valid_dir: Path) -> str:
+    """Return valid_dir as a normalized absolute path string.
+
+    Refuses a symlinked valid_dir: deletions would land in the link target,
+    and paths built from it would not match what scandir reports.
+    """
+    if os.path.islink(valid_dir):
+        raise ValueError(f"valid_dir must not be a symlink: {valid_dir}")
+    return norm_path(valid_dir)
+
+
+def iter_lines(path: Path) -> Iterator[str]:
+    """Yield the stripped, non-empty, non-comment lines of path, one at a time."""
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for ln in f:
+            s = ln.strip()
+            if s and not s.startswith("#"):
+                yield s
+
+
+def read_lines(path: Path) -> List[str]:
+    return list(iter_lines(path))
+
+
+def write_lines(path: Path, lines: Iterable[str]) -> None:
+    # Join once and write a single blob instead of one write per line
+    lines = lines if isinstance(lines, list) else list(lines)
+    data = ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+    with path.open("wb") as f:
+        f.write(data)
+
+
+def add_ancestors(keep: Set[str], path: str, stop_at: str) -> None:
+    """Add path and its ancestors up to stop_at (inclusive) to keep.
+
+    The walk stops at the first directory already in keep: sibling APIs share
+    prefixes, so every directory is visited once across all APIs.
+    """
+    cur = path
+    while cur not in keep:
+        keep.add(cur)
+        if cur == stop_at:
+            break
+        parent = os.path.dirname(cur)
+        if parent == cur:
+            break
+        cur = parent
+
+
+def build_keep(valid_dir_abs: str, apis: Iterable[str], roots: Optional[Set[str]] = None) -> Set[str]:
+    """Directories under valid_dir_abs to keep for apis.
+
+    For each API, keep valid_dir/<root> (e.g., torch) and the deepest existing
+    directory on its path (e.g., torch/nn/functional/relu) with all ancestors.
+    APIs whose root directory does not exist are skipped, as are APIs whose
+    root namespace is not in roots (when given).
+    """
+    keep: Set[str] = set()
+    # Sibling APIs probe the same roots and parents; stat each path once
+    isdir_cache: Dict[str, bool] = {}
+
+    def is_dir(path: str) -> bool:
+        res = isdir_cache.get(path)
+        if res is None:
+            try:
+                res = stat.S_ISDIR(os.stat(path).st_mode)
+            except OSError:
+                res = False
+            isdir_cache[path] = res
+        return res
+
+    for api in apis:
+        # Identify root under valid_dir (top-level namespace like torch, tf)
+        parts = api.split(".")
+        if roots is not None and parts[0] not in roots:
+            continue
+        root = os.path.join(valid_dir_abs, parts[0])
+        if not is_dir(root):
+            # No such root; skip
+            continue
+        keep.add(root)
+        # Only consider existing leaf directories; collect ancestors if present
+        # If leaf doesn't exist, still keep ancestors that exist
+        cur = os.sep.join((valid_dir_abs, *parts))
+        while True:
+            if is_dir(cur):
+                add_ancestors(keep, cur, stop_at=root)
+                break
+            if cur == root:
+                break
+            cur = os.path.dirname(cur)
+    return keep
+
+
+# Batches passed to one `rm -rf`, kept well under ARG_MAX
+_RM_BATCH = 512
+
+
+def _rmtree(path: str) -> List[str]:
+    try:
+        shutil.rmtree(path)
+        return [f"Removed: {path}"]
+    except Exception as e:
+        return [f"[WARN] Failed to remove {path}: {e}"]
+
+
+def _rm_rf(rm: str, batch: List[str]) -> List[str]:
+    res = subprocess.run([rm, "-rf", "--", *batch], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    lines: List[str] = []
+    for p in batch:
+        if res.returncode != 0 and os.path.lexists(p):
+            lines.append(f"[WARN] Failed to remove {p}: {res.stderr.strip() or f'rm exited {res.returncode}'}")
+        else:
+            lines.append(f"Removed: {p}")
+    return lines
+
+
+def remove_dirs(paths: List[str], fast_rm: bool = True) -> None:
+    """Remove each directory tree in paths, printing one line per path.
+
+    The trees are disjoint, so they are deleted on a thread pool: unlink/rmdir
+    release the GIL and the filesystem sees several deletions at once. With
+    fast_rm and rm(1) available, each task is one `rm -rf` over a batch of
+    paths instead of a Python-level shutil.rmtree walk.
+    """
+    if not paths:
+        return
+    workers = min(16, (os.cpu_count() or 4) * 2)
+    rm = shutil.which("rm") if fast_rm and os.name == "posix" else None
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        if rm is None:
+            results = ex.map(_rmtree, paths)
+        else:
+            # Spread the paths over the workers, but never pass more than _RM_BATCH per call
+            size = max(1, min(_RM_BATCH, -(-len(paths) // workers)))
+            batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+            results = ex.map(lambda b: _rm_rf(rm, b), batches)
+        for lines in results:
+            for line in lines:
+                print(line)
+
+
+def collect_prune_roots(root: str, keep_dirs: Set[str]) -> List[str]:
+    """Paths of the subdirectories under root that are not in keep_dirs.
+
+    root and keep_dirs are absolute, normalized path strings, and keep_dirs must
+    contain all ancestor directories (below root) for kept leaves. Each child is
+    checked with a plain string set lookup, without resolving anything. Pruned
+    directories are returned without being descended into; symlinked
+    directories are left alone.
+    """
+    prune_roots: List[str] = []
+    # Depth-first over os.scandir: the dirent type answers is_dir() without a stat
+    stack = [root]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                subdirs = [e.path for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            continue
+        for child in subdirs:
+            if child in keep_dirs:
+                stack.append(child)
+            else:
+                # Remove entire subtree
+                prune_roots.append(child)
+    return prune_roots
+
+
+def prune(root: str, keep: Set[str], fast_rm: bool = True) -> None:
+    """Delete the directories under root that are not in keep; files are left alone.
+
+    Every prune root is collected first, then all of them are deleted in one
+    parallel pass.
+    """
+    remove_dirs(collect_prune_roots(root, keep), fast_rm=fast_rm)
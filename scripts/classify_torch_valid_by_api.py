@@ -22,7 +22,7 @@ Usage examples:
   - Move files instead of symlinking (destructive):
       python scripts/classify_torch_valid_by_api.py --mode move
 
-  - Build a full JSON index with file lists:
+  - Also write a per-file index (index.jsonl):
       python scripts/classify_torch_valid_by_api.py --full-index
 """
 
@@ -30,14 +30,16 @@ from __future__ import annotations
 
 import argparse
 import csv
+import errno
+import functools
 import json
 import os
 import re
 import shutil
 import sys
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 
 FILENAME_RE = re.compile(r"^(?P<api>.+)_(?P<id>\d+)\.py$")
@@ -73,24 +75,103 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
+def _fast_copy(src: Path, dest: Path) -> None:
+    """shutil.copy2 equivalent that lets the kernel copy the data.
+
+    os.copy_file_range keeps the bytes in kernel space and can reflink on
+    filesystems that support it; anything it cannot handle goes to copy2.
+    Like copy2, it refuses to copy a file onto itself: dest may be a link to
+    src left by an earlier symlink/hardlink run, and opening it for writing
+    would truncate src.
+    """
+    try:
+        same = os.path.samefile(src, dest)
+    except OSError:
+        same = False
+    if same:
+        raise shutil.SameFileError(f"{str(src)!r} and {str(dest)!r} are the same file")
+    try:
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if n == 0:
+                    break
+                remaining -= n
+        shutil.copystat(src, dest)
+    except Exception:
+        shutil.copy2(src, dest)
+
+
+@functools.lru_cache(maxsize=4096)
+def _rel_prefix(src_dir: str, dest_dir: str) -> str:
+    """Relative path from dest_dir to src_dir; shared by every file of that pair."""
+    return os.path.relpath(src_dir, start=dest_dir)
+
+
+class DirFdCache:
+    """Bounded cache of open directory fds, for creating entries with dir_fd=.
+
+    Entries are then created relative to the already-open directory instead of
+    resolving the full destination path again for every file.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._fds: OrderedDict[str, int] = OrderedDict()
+
+    def get(self, path: str) -> int:
+        fd = self._fds.pop(path, None)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+            if len(self._fds) >= self.maxsize:
+                _, oldest = self._fds.popitem(last=False)
+                os.close(oldest)
+        self._fds[path] = fd
+        return fd
+
+    def close(self) -> None:
+        while self._fds:
+            _, fd = self._fds.popitem()
+            os.close(fd)
+
+
 def place_file(
     src: Path,
     dest_dir: Path,
     mode: str = "symlink",
     allow_overwrite: bool = False,
+    dir_fds: Optional[DirFdCache] = None,
+    taken_names: Optional[Dict[str, Set[str]]] = None,
 ) -> Path:
     """Place src inside dest_dir according to mode. Returns the destination path.
 
     mode: 'symlink' (default), 'hardlink', 'copy', or 'move'.
     When a file with the same name exists, we avoid clobbering by adding a suffix.
+    With dir_fds, symlinks are created relative to a cached fd of dest_dir.
+    With taken_names (dest_dir -> names in it, shared across calls), dest_dir is
+    listed once and collisions are resolved in memory instead of stat()ing
+    every -dupN candidate.
     """
-    ensure_dir(dest_dir)
+    taken: Optional[Set[str]] = None
+    if taken_names is not None:
+        key = str(dest_dir)
+        taken = taken_names.get(key)
+        if taken is None:
+            ensure_dir(dest_dir)
+            with os.scandir(dest_dir) as it:
+                taken = taken_names[key] = {e.name for e in it}
+    else:
+        ensure_dir(dest_dir)
     dest = dest_dir / src.name
 
+    def is_taken(p: Path) -> bool:
+        return p.name in taken if taken is not None else p.exists()
+
     def finalize_path(p: Path) -> Path:
         if allow_overwrite:
             return p
-        if not p.exists():
+        if not is_taken(p):
             return p
         # Find a non-colliding name by adding -dupN before extension
         stem = p.stem
@@ -98,17 +179,23 @@ def place_file(
         n = 1
         while True:
             candidate = p.with_name(f"{stem}-dup{n}{suffix}")
-            if not candidate.exists():
+            if not is_taken(candidate):
                 return candidate
             n += 1
 
     dest = finalize_path(dest)
+    if taken is not None:
+        taken.add(dest.name)
 
     if mode == "symlink":
         # Use relative symlink for portability if possible
         try:
-            rel_src = os.path.relpath(src, start=dest.parent)
-            os.symlink(rel_src, dest)
+            prefix = _rel_prefix(str(src.parent), str(dest.parent))
+            rel_src = src.name if prefix == os.curdir else os.path.join(prefix, src.name)
+            if dir_fds is not None and os.symlink in os.supports_dir_fd:
+                os.symlink(rel_src, dest.name, dir_fd=dir_fds.get(str(dest.parent)))
+            else:
+                os.symlink(rel_src, dest)
         except FileExistsError:
             pass
         except FileNotFoundError:
@@ -121,17 +208,23 @@ def place_file(
             try:
                 os.link(src, dest)
             except OSError:
-                shutil.copy2(src, dest)
+                _fast_copy(src, dest)
     elif mode == "hardlink":
         try:
             os.link(src, dest)
         except OSError:
             # Fallback to copy if hardlink not possible (e.g., cross-device)
-            shutil.copy2(src, dest)
+            _fast_copy(src, dest)
     elif mode == "copy":
-        shutil.copy2(src, dest)
+        _fast_copy(src, dest)
     elif mode == "move":
-        shutil.move(src, dest)
+        # A same-filesystem move is a single rename; only cross-device moves need shutil
+        try:
+            os.replace(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dest)
     else:
         raise ValueError(f"Unknown mode: {mode}")
 
@@ -149,8 +242,8 @@ def classify(
 ) -> Dict[str, List[str]]:
     """Classify files by API name.
 
-    Returns a mapping api -> list of destination file paths (as strings). If
-    full_index is False, the lists will be empty to save memory.
+    Returns a mapping api -> [] for every API seen. With full_index, the
+    per-file entries are streamed to index.jsonl instead of kept in memory.
     """
     input_dir = input_dir.resolve()
     output_dir = output_dir.resolve()
@@ -158,42 +251,60 @@ def classify(
         raise FileNotFoundError(f"Input directory not found: {input_dir}")
     ensure_dir(output_dir)
 
-    api_to_files: Dict[str, List[str]] = defaultdict(list)
+    api_to_files: Dict[str, List[str]] = {}
     counts: Counter[str] = Counter()
 
-    files_iter: Iterable[Path] = (p for p in input_dir.iterdir() if p.is_file())
+    # Snapshot (name, path) strings up front: move mode renames entries out of
+    # input_dir while we iterate. Path objects are only built for placed files.
+    with os.scandir(input_dir) as it:
+        entries: List[Tuple[str, str]] = [(e.name, e.path) for e in it if e.is_file()]
 
     processed = 0
     skipped = 0
+    match_name = FILENAME_RE.match
 
-    for p in files_iter:
-        if max_files is not None and processed >= max_files:
-            break
-        if p.suffix != ".py":
-            skipped += 1
-            continue
-        extracted = extract_api_from_filename(p.name)
-        if not extracted:
-            skipped += 1
-            continue
-        api, _sid = extracted
-        # Build destination directory: replace dots with path separators
-        api_dir_rel = api.replace(".", os.sep)
-        dest_dir = output_dir / api_dir_rel
-
-        dest_path: Path
-        if dry_run:
-            dest_path = dest_dir / p.name
-        else:
-            dest_path = place_file(p, dest_dir, mode=mode, allow_overwrite=allow_overwrite)
-
-        counts[api] += 1
-        if full_index:
-            api_to_files[api].append(str(dest_path))
-        else:
-            # Keep minimal memory footprint
+    dir_fds = DirFdCache()
+    taken_names: Dict[str, Set[str]] = {}
+    # One {"api", "file"} object per line, written as files are placed
+    index_fh = (output_dir / "index.jsonl").open("w") if full_index and not dry_run else None
+    try:
+        for name, path in entries:
+            if max_files is not None and processed >= max_files:
+                break
+            if not name.endswith(".py"):
+                skipped += 1
+                continue
+            m = match_name(name)
+            if not m:
+                skipped += 1
+                continue
+            api = m.group("api")
+            # Build destination directory: replace dots with path separators
+            api_dir_rel = api.replace(".", os.sep)
+            dest_dir = output_dir / api_dir_rel
+
+            dest_path: Path
+            if dry_run:
+                dest_path = dest_dir / name
+            else:
+                dest_path = place_file(
+                    Path(path),
+                    dest_dir,
+                    mode=mode,
+                    allow_overwrite=allow_overwrite,
+                    dir_fds=dir_fds,
+                    taken_names=taken_names,
+                )
+
+            counts[api] += 1
+            if index_fh is not None:
+                index_fh.write(json.dumps({"api": api, "file": str(dest_path)}) + "\n")
             api_to_files.setdefault(api, [])
-        processed += 1
+            processed += 1
+    finally:
+        dir_fds.close()
+        if index_fh is not None:
+            index_fh.close()
 
     # Write indexes
     if not dry_run:
@@ -205,18 +316,16 @@ def classify(
             for api, cnt in sorted(counts.items(), key=lambda x: (-x[1], x[0])):
                 writer.writerow([api, cnt])
 
-        # JSON index (counts + optional file lists)
+        # JSON index (counts; per-file lists live in index.jsonl with --full-index)
         json_obj = {
             "input_dir": str(input_dir),
             "output_dir": str(output_dir),
             "mode": mode,
             "total_processed": processed,
             "total_skipped": skipped,
+            "files_index": "index.jsonl" if full_index else None,
             "apis": {
-                api: {
-                    "count": counts[api],
-                    "files": api_to_files[api] if full_index else None,
-                }
+                api: {"count": counts[api]}
                 for api in sorted(api_to_files.keys())
             },
         }
@@ -261,7 +370,7 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "--full-index",
         action="store_true",
-        help="Include file lists in the JSON index (can be large).",
+        help="Also write index.jsonl with one {api, file} line per placed file (can be large).",
     )
     parser.add_argument(
         "--allow-overwrite",
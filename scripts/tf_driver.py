@@ -1,7 +1,10 @@
 import argparse
+import importlib.util
+import marshal
 import os
 import sys
 from pathlib import Path
+from types import CodeType
 from typing import List, Optional, Dict, Any
 
 # Pre-import tensorflow and numpy (if available) and inject into executed scripts' globals.
@@ -15,6 +18,55 @@ try:
 except Exception:  # pragma: no cover
     _np = None  # type: ignore
 
+# Set by --use-pycache: also keep hash-checked .pyc files in __pycache__ next to the inputs
+_USE_PYCACHE = False
+# .pyc flags: hash-based (bit 0) and checked against the source (bit 1)
+_PYC_CHECKED_HASH = 0b11
+
+
+def _load_pyc(path_str: str, raw: bytes) -> Optional[CodeType]:
+    try:
+        with open(importlib.util.cache_from_source(path_str), "rb") as fh:
+            data = fh.read()
+    except (OSError, ValueError):
+        return None
+    if (
+        data[:4] != importlib.util.MAGIC_NUMBER
+        or int.from_bytes(data[4:8], "little") != _PYC_CHECKED_HASH
+        or data[8:16] != importlib.util.source_hash(raw)
+    ):
+        return None
+    try:
+        return marshal.loads(data[16:])
+    except Exception:
+        return None
+
+
+def _store_pyc(path_str: str, raw: bytes, code: CodeType) -> None:
+    # Best effort: read-only input trees simply never get a cache
+    try:
+        cfile = importlib.util.cache_from_source(path_str)
+        os.makedirs(os.path.dirname(cfile), exist_ok=True)
+        tmp = f"{cfile}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(importlib.util.MAGIC_NUMBER)
+            fh.write(_PYC_CHECKED_HASH.to_bytes(4, "little"))
+            fh.write(importlib.util.source_hash(raw))
+            fh.write(marshal.dumps(code))
+        os.replace(tmp, cfile)
+    except (OSError, ValueError):
+        pass
+
+
+def _compile_cached(raw: bytes, path_str: str) -> CodeType:
+    """compile() the source; with --use-pycache, reuse or write a hash-checked .pyc for it."""
+    code = _load_pyc(path_str, raw) if _USE_PYCACHE else None
+    if code is None:
+        code = compile(raw.decode("utf-8", errors="ignore"), path_str, "exec")
+        if _USE_PYCACHE:
+            _store_pyc(path_str, raw, code)
+    return code
+
 
 def run_file_with_exec(py_file: Path) -> int:
     """Execute a Python file using compile/exec in an isolated globals dict.
@@ -22,7 +74,7 @@ def run_file_with_exec(py_file: Path) -> int:
     Returns 0 on success, non-zero on exception. Never raises.
     """
     try:
-        src = py_file.read_text(encoding="utf-8", errors="ignore")
+        raw = py_file.read_bytes()
     except Exception as e:
         print(f"[tf_driver] READ-FAIL {py_file}: {e}")
         return 1
@@ -45,13 +97,13 @@ def run_file_with_exec(py_file: Path) -> int:
         g["numpy"] = _np
 
     # Temporarily adjust cwd and sys.path so relative imports/files work
-    old_cwd = Path.cwd()
+    old_cwd = os.getcwd()
     old_sys_path = list(sys.path)
     try:
         os.chdir(str(py_file.parent))
         if str(py_file.parent) not in sys.path:
             sys.path.insert(0, str(py_file.parent))
-        compiled_code = compile(src, str(py_file), "exec")
+        compiled_code = _compile_cached(raw, str(py_file))
         exec(compiled_code, g)
         print(f"[tf_driver] OK {py_file}")
         return 0
@@ -67,30 +119,53 @@ def run_file_with_exec(py_file: Path) -> int:
     finally:
         # Restore environment for next file
         try:
-            os.chdir(str(old_cwd))
+            os.chdir(old_cwd)
         except Exception:
             pass
         sys.path[:] = old_sys_path
 
 
-def discover_py_files(inputs_dir: Path, recursive: bool = True) -> List[Path]:
-    if recursive:
-        return sorted(p for p in inputs_dir.rglob("*.py") if p.is_file())
-    return sorted(p for p in inputs_dir.glob("*.py") if p.is_file())
+def discover_py_files(inputs_dir: Path, recursive: bool = True, sort: bool = True) -> List[str]:
+    """Paths (as strings) of the .py files under inputs_dir, walked with os.scandir.
+
+    Like rglob, symlinked directories are not descended into, while symlinked
+    files (e.g. a symlink-mode classification tree) are still picked up.
+    """
+    found: List[str] = []
+    stack = [str(inputs_dir)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(e.path)
+                elif e.name.endswith(".py") and e.is_file():
+                    found.append(e.path)
+    if sort:
+        found.sort()
+    return found
 
 
 def main(argv: Optional[List[str]] = None) -> int:
     parser = argparse.ArgumentParser(description="TensorFlow driver: exec() all Python files in a directory, never fail on one file")
     parser.add_argument("--inputs-dir", required=True, help="Directory containing Python files")
     parser.add_argument("--non-recursive", action="store_true", help="Only run files directly under inputs-dir (no recursion)")
+    parser.add_argument("--unsorted", action="store_true", help="Run files in directory order instead of sorting them by path first")
+    parser.add_argument("--use-pycache", action="store_true", help="Reuse/write hash-checked .pyc files in __pycache__ so later runs skip compile()")
     args = parser.parse_args(argv)
+    global _USE_PYCACHE
+    _USE_PYCACHE = args.use_pycache
 
     inputs_dir = Path(args.inputs_dir)
     if not inputs_dir.exists() or not inputs_dir.is_dir():
         print(f"[tf_driver] Inputs dir not found: {inputs_dir}", file=sys.stderr)
         return 2
 
-    files = discover_py_files(inputs_dir, recursive=not args.non_recursive)
+    files = discover_py_files(inputs_dir, recursive=not args.non_recursive, sort=not args.unsorted)
     if not files:
         print("[tf_driver] No Python files found", file=sys.stderr)
         return 0
@@ -99,7 +174,7 @@ def main(argv: Optional[List[str]] = None) -> int:
     n_ok = 0
     n_fail = 0
     for f in files:
-        rc = run_file_with_exec(f)
+        rc = run_file_with_exec(Path(f))
         if rc == 0:
             n_ok += 1
         else:
@@ -1,88 +1,64 @@
 import argparse
+import contextlib
+import functools
+import multiprocessing
 import os
 import subprocess
 import sys
-from concurrent.futures import ProcessPoolExecutor, as_completed, Future
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Optional, List, Tuple
 
-def _run_subdir(subdir: Path, driver_path: Path, prof: Path, timeout: int) -> Tuple[str, int, str, str]:
+# Shared helpers live next to this script (cov.py copies them into the container with it)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _driver_common import THREAD_ENV, default_jobs, find_profdata_tool, merge_profraws, run_in_process, submit_bounded, warm, worker_init  # noqa: E402
+
+
+def _run_subdir(subdir: Path, driver_path: Path, profroot: Path, timeout: int, log_dir: Path) -> Tuple[str, int, str, str]:
 	"""Run driver (torch or tf) on a subdirectory with LLVM_PROFILE_FILE set.
 
 	Returns: (subdir, returncode, stdout, stderr)
 	"""
-	prof.parent.mkdir(parents=True, exist_ok=True)
 	env = os.environ.copy()
-	env["LLVM_PROFILE_FILE"] = str(prof)
-	# Constrain threading/concurrency to 1 for PyTorch / TensorFlow and math libs
-	env.update({
-		"OMP_NUM_THREADS": "1",
-		"OMP_THREAD_LIMIT": "1",
-		"MKL_NUM_THREADS": "1",
-		"OPENBLAS_NUM_THREADS": "1",
-		"NUMEXPR_NUM_THREADS": "1",
-		"BLIS_NUM_THREADS": "1",
-		"VECLIB_MAXIMUM_THREADS": "1",
-		# TensorFlow specific knobs
-		"TF_NUM_INTRAOP_THREADS": "1",
-		"TF_NUM_INTEROP_THREADS": "1",
-	})
+	env["LLVM_PROFILE_FILE"] = str(profroot / f"cov-{subdir.name}-%p.profraw")
+	env.update(THREAD_ENV)
 	cmd = [sys.executable, str(driver_path), "--inputs-dir", str(subdir)]
+	# Output goes to a per-subdir file and is only read back on failure
+	log_path = log_dir / f"{subdir.name}.log"
 	try:
-		proc = subprocess.run(
-			cmd,
-			cwd=str(subdir),
-			text=True,
-			capture_output=True,
-			env=env,
-			timeout=timeout,
-		)
-		return (str(subdir), proc.returncode, proc.stdout, proc.stderr)
-	except subprocess.TimeoutExpired as te:
-		if isinstance(te.stdout, (bytes, bytearray)):
-			stdout = te.stdout.decode(errors="ignore")
-		else:
-			stdout = str(te.stdout) if te.stdout is not None else ""
-		if isinstance(te.stderr, (bytes, bytearray)):
-			stderr = te.stderr.decode(errors="ignore")
-		else:
-			stderr = str(te.stderr) if te.stderr is not None else f"Timeout after {timeout}s"
-		return (str(subdir), 124, stdout, stderr)
+		with open(log_path, "wb") as log:
+			try:
+				rc = subprocess.run(
+					cmd,
+					cwd=str(subdir),
+					stdout=log,
+					stderr=subprocess.STDOUT,
+					env=env,
+					timeout=timeout,
+				).returncode
+			except subprocess.TimeoutExpired:
+				rc = 124
+		if rc == 0:
+			log_path.unlink()
+			return (str(subdir), 0, "", "")
+		output = log_path.read_text(errors="ignore")
+		if rc == 124:
+			output += f"Timeout after {timeout}s"
+		return (str(subdir), rc, "", output)
 	except Exception as e:
 		return (str(subdir), 1, "", f"Exception: {e}")
 
 
-def _find_profdata_tool() -> Optional[str]:
-	candidates: List[Optional[str]] = [
-		os.environ.get("LLVM_PROFDATA"),
-		"llvm-profdata",
-		"llvm-profdata-18",
-		"llvm-profdata-17",
-		"llvm-profdata-16",
-		"llvm-profdata-15",
-		"llvm-profdata-14",
-	]
-	for c in candidates:
-		if not c:
-			continue
-		try:
-			# Some builds don't support --version; use a subcommand help to test availability
-			res = subprocess.run([c, "merge", "-help"], capture_output=True, text=True)
-			if res.returncode == 0:
-				return c
-		except FileNotFoundError:
-			continue
-	return None
-
-
 def main(argv: Optional[List[str]] = None) -> int:
 	parser = argparse.ArgumentParser(description="titanfuzz driver: run torch/tf driver per subdirectory and merge coverage")
 	parser.add_argument("--inputs-dir", required=True, help="Top-level directory containing subdirectories of Python files")
 	parser.add_argument("--profraw-root", required=True, help="Root directory for .profraw outputs")
 	parser.add_argument("--profdata-out", required=True, help="Path to write merged .profdata output")
 	parser.add_argument("--timeout-sec", type=int, default=180, help="Per-subdir timeout in seconds")
-	parser.add_argument("--jobs", type=int, default=max(1, os.cpu_count() or 1), help="Parallel worker processes")
+	parser.add_argument("--jobs", type=int, default=default_jobs(), help="Parallel worker processes (default: usable CPUs, capped by the cgroup CPU quota)")
 	parser.add_argument("--dll", choices=["torch", "tf"], default=os.environ.get("DLL", "torch"), help="Which framework to preload in driver")
+	parser.add_argument("--in-process", action="store_true", help="Run subdirs inside warmed worker processes that import the framework once, instead of one interpreter per subdir")
+	parser.add_argument("--pin-cpus", action="store_true", help="Pin each worker process (and the drivers it starts) to its own CPU")
 	args = parser.parse_args(argv)
 
 	inputs_dir = Path(args.inputs_dir)
@@ -117,16 +93,35 @@ def main(argv: Optional[List[str]] = None) -> int:
 
 	print(f"[driver] Running {driver_path.name} for {len(subdirs)} subdirs with {jobs} workers, timeout={timeout}s")
 
-	# Dispatch work across processes: one .profraw per subdir
-	futures: List[Future[Tuple[str, int, str, str]]] = []
+	# Keep a few tasks queued per worker, but not one Future per subdir
+	window = jobs * 4
 	results: List[Tuple[str, int, str, str]] = []
-	with ProcessPoolExecutor(max_workers=jobs) as exe:
-		for sd in subdirs:
-			rel = sd.relative_to(inputs_dir)
-			out_prof = profroot_path / rel / "coverage.profraw"
-			futures.append(exe.submit(_run_subdir, sd, driver_path, out_prof, timeout))
-		for fut in as_completed(futures):
-			results.append(fut.result())
+	if args.in_process:
+		# One .profraw per worker and instrumented module (%p-%m); spawned workers
+		# exit normally, so the profile runtime's own atexit writer still runs
+		# after the last flush.
+		prof_pattern = str(profroot_path / "cov-%p-%m.profraw")
+		running_dir = profroot_path / "running"
+		running_dir.mkdir(exist_ok=True)
+		ctx = multiprocessing.get_context("spawn")
+		initializer, initargs = worker_init(args.pin_cpus, ctx, warm, (str(driver_path), timeout, prof_pattern, str(running_dir)))
+		results.extend(run_in_process([str(sd) for sd in subdirs], jobs, ctx, initializer, initargs, str(running_dir)))
+		with contextlib.suppress(OSError):
+			running_dir.rmdir()
+	else:
+		# Dispatch work across processes. Every subdir writes its own profiles,
+		# flat under profroot (cov-<subdir>-<pid>.profraw, so processes the tests
+		# start do not overwrite them): a run killed by the timeout mid-write can
+		# only damage its own file, which the --failure-mode=all merge then skips.
+		# Driver output is written to logs/<subdir>.log; only failures keep theirs
+		log_dir = profroot_path / "logs"
+		log_dir.mkdir(exist_ok=True)
+		run = functools.partial(_run_subdir, driver_path=driver_path, profroot=profroot_path, timeout=timeout, log_dir=log_dir)
+		ctx = multiprocessing.get_context()
+		initializer, initargs = worker_init(args.pin_cpus, ctx, None, ())
+		with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, initializer=initializer, initargs=initargs) as exe:
+			for _, fut in submit_bounded(exe, run, subdirs, window):
+				results.append(fut.result())
 
 	# Report
 	failures = 0
@@ -146,17 +141,17 @@ def main(argv: Optional[List[str]] = None) -> int:
 			failures += 1
 
 	# Merge profraws -> profdata
-	all_profraws = [str(p) for p in profroot_path.rglob("*.profraw")]
+	with os.scandir(profroot_path) as it:
+		all_profraws = sorted(e.path for e in it if e.name.startswith("cov-") and e.name.endswith(".profraw"))
 	if not all_profraws:
 		print("[driver] No .profraw files generated; aborting merge", file=sys.stderr)
 		return 1
-	tool = _find_profdata_tool()
+	tool = find_profdata_tool()
 	if not tool:
 		print("[driver] llvm-profdata not found", file=sys.stderr)
 		return 1
-	merge_cmd = [tool, "merge", "--num-threads=0", "--failure-mode=all" ,"-sparse", "-o", str(profdata_out)] + all_profraws
 	print(f"[driver] Merging {len(all_profraws)} profraw -> {profdata_out}")
-	merge = subprocess.run(merge_cmd, capture_output=True, text=True)
+	merge = merge_profraws(tool, all_profraws, profdata_out, jobs)
 	if merge.returncode != 0:
 		print(merge.stdout)
 		print(merge.stderr, file=sys.stderr)